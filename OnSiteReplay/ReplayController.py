@@ -1,26 +1,35 @@
-import copy
+import numpy as np
 
 from utils.ScenarioManager.ScenarioInfo import ScenarioInfo
 from utils.observation import Observation
-from utils.functions import detectCollision, is_point_inside_rect, updateEgoPos
+from utils.functions import detectCollision, detectSweptCollision, is_point_inside_rect, updateEgoPos
 from utils.logger import logger
+from utils.opendrive2discretenet import BORDER_MEMO_SIZE
 
+from .ReplayInfo import ReplayInfo
 from .ReplayParser import ReplayParser
 
 
 class ReplayController():
-    def __init__(self, visualize=False):
-        self.parser = ReplayParser()
+    def __init__(self, visualize=False, continuous_collision=False, memo_size=BORDER_MEMO_SIZE):
+        self.parser = ReplayParser(memo_size)
         self.control_info = None
         self.visualize = visualize
         self.observation = Observation()
+        # 是否检测相邻两帧之间的碰撞，以及用于连续碰撞检测的上一帧观测
+        self.continuous_collision = continuous_collision
+        self.prev_observation = None
         if self.visualize:
             from utils.visualizer import Visualizer
             self.visualizer = Visualizer()
 
-    def init(self, scenario_info: ScenarioInfo) -> Observation:
+    def init(self, scenario_info: ScenarioInfo, replay_info: ReplayInfo = None) -> Observation:
+        """
+        加载测试场景，传入预先解析的replay_info（如ScenarioManager后台预取的结果）时不再重新解析场景
+        """
         self.scenario_info = scenario_info
-        self.control_info = self.parser.parse(scenario_info)
+        self.control_info = replay_info if replay_info is not None else self.parser.parse(scenario_info)
+        self.prev_observation = None
         if self.visualize:
             self.visualizer.live_init(scenario_info, self.control_info.road_info)
 
@@ -28,15 +37,15 @@ class ReplayController():
         self.observation.update_test_info(dt=self.scenario_info.task_info['dt'])
     
     def get_observation(self) -> Observation:
-        return copy.deepcopy(self.observation)
+        return self.observation.snapshot()
 
     def update_frame(self):
-        t = str(round(self.observation.test_info['t'], 3))
-        self._update_other_objects_to_t(t, self.observation)
-        self._update_light_info_to_t(t, self.observation)
+        frame = self.control_info.frame_index(self.observation.test_info['t'])
+        self._update_other_objects_to_frame(frame, self.observation)
+        self._update_light_info_to_frame(frame, self.observation)
         self._update_end_status(self.observation)
         if self.visualize:
-            self.visualizer.live_update(self.get_observation())
+            self.visualizer.live_update(self.observation)
     
     def update_ego(self, action: list) -> Observation:
         # 取出步长
@@ -47,16 +56,20 @@ class ReplayController():
         self.observation.update_test_info(t=round(float(self.observation.test_info['t'] + dt), decimal_places))
         updateEgoPos(action, dt, self.observation.ego_info)
 
-    def _update_light_info_to_t(self, t: str, observation: Observation) -> None:
-        observation.update_light_info(self.control_info.light_info.get(t, ""))
+    def _update_light_info_to_frame(self, frame: int, observation: Observation) -> None:
+        observation.update_light_info(self.control_info.light_info.get(frame, ""))
 
-    def _update_other_objects_to_t(self, t: str, observation: Observation) -> None:
-        observation.erase_object_info()
+    def _update_other_objects_to_frame(self, frame: int, observation: Observation) -> None:
         for obj_type in ['vehicle', 'bicycle', 'pedestrian']:
-            for obj_id, obj_info in self.control_info.__getattribute__(f"{obj_type}_traj").items():
-                if t in obj_info.keys():
-                    observation.update_object_info(obj_type, obj_id, **obj_info[t])
-                    observation.update_object_info(obj_type, obj_id, **obj_info['shape'])
+            # 仅取出该帧存在的交通参与者，整帧一次写入observation
+            traj = self.control_info.__getattribute__(f"{obj_type}_traj")
+            rows, states, shapes = traj.get_frame(frame)
+            observation.update_objects(
+                obj_type,
+                [traj.ids[row] for row in rows.tolist()],
+                np.concatenate([states, shapes], axis=1),
+                traj.FIELDS + traj.SHAPE_FIELDS,
+            )
 
     def _update_end_status(self, observation: Observation) -> None:
         """计算T时刻, 测试是否终止, 更新observation.test_info中的end值
@@ -86,6 +99,9 @@ class ReplayController():
         # 当测试时间大于0.5秒时，遍历所有车辆，绘制对应的多边形。这是因为数据问题，有些车辆在初始位置有重叠。也就是说0.5s以内不会判断是否碰撞。
         if observation.test_info['t'] > 0.5:
             collideInfo = detectCollision(observation.ego_info, observation.object_info)
+            # 上一帧同样处于碰撞检测时段时，检测两帧之间主车是否穿过背景要素
+            if not collideInfo and self.prev_observation is not None and self.prev_observation.test_info['t'] > 0.5:
+                collideInfo = detectSweptCollision(self.prev_observation, observation)
             if collideInfo:
                 status = 3
                 logger.debug(f"(CODE-3): 检测到测试车与背景车{collideInfo['collideVehicle']['id']}发生碰撞")
@@ -99,3 +115,5 @@ class ReplayController():
             logger.debug(f"(CODE-1): 测试车成功抵达目标区域")
 
         observation.update_test_info(end=status)
+        if self.continuous_collision:
+            self.prev_observation = observation.snapshot()
@@ -1,11 +1,13 @@
 import numpy as np
 
+from .TrajectoryStore import TrajectoryStore
+
 class ReplayInfo():
 
     def __init__(self):
-        self.vehicle_traj = {}
-        self.bicycle_traj = {}
-        self.pedestrian_traj = {}
+        self.vehicle_traj = TrajectoryStore()
+        self.bicycle_traj = TrajectoryStore()
+        self.pedestrian_traj = TrajectoryStore()
         self.ego_info = {
             "length": 4.924,
             "width": 1.872,
@@ -44,53 +46,24 @@ class ReplayInfo():
     def add_vehicle(self, id, t, x=None, y=None, v=None, a=None, yaw=None, length=None, width=None):
         """
         该函数实现向vehicle_trajectiry中添加背景车轨迹信息的功能
+        t与x, y, v, a, yaw既可以是单个轨迹点，也可以是整条轨迹对应的数组
         """
         if id == "ego":
             self._add_vehicle_ego(x, y, v, a, yaw, length, width)
         else:
-            if id not in self.vehicle_traj.keys():
-                self.vehicle_traj[id] = {}
-                self.vehicle_traj[id]['shape'] = {}
-            if t not in self.vehicle_traj[id].keys():
-                self.vehicle_traj[id][t] = {}
-            for key, value in zip(['x', 'y', 'v', 'a', 'yaw'], [x, y, v, a, yaw]):
-                if value is not None:
-                    self.vehicle_traj[id][t][key] = value
-            for key, value in zip(['length', 'width'], [length, width]):
-                if value is not None:
-                    self.vehicle_traj[id]['shape'][key] = value
+            self.vehicle_traj.add(id, t, x=x, y=y, v=v, a=a, yaw=yaw, length=length, width=width)
 
     def add_bicycle(self, id, t, x=None, y=None, v=None, a=None, yaw=None, length=None, width=None):
         """
         该函数实现向bicycle_trajectiry中添加背景车轨迹信息的功能
         """
-        if id not in self.bicycle_traj.keys():
-            self.bicycle_traj[id] = {}
-            self.bicycle_traj[id]['shape'] = {}
-        if t not in self.bicycle_traj[id].keys():
-            self.bicycle_traj[id][t] = {}
-        for key, value in zip(['x', 'y', 'v', 'a', 'yaw'], [x, y, v, a, yaw]):
-            if value is not None:
-                self.bicycle_traj[id][t][key] = value
-        for key, value in zip(['length', 'width'], [length, width]):
-            if value is not None:
-                self.bicycle_traj[id]['shape'][key] = value
+        self.bicycle_traj.add(id, t, x=x, y=y, v=v, a=a, yaw=yaw, length=length, width=width)
 
     def add_pedestrian(self, id, t, x=None, y=None, v=None, a=None, yaw=None, length=None, width=None):
         """
         该函数实现向bicycle_trajectiry中添加背景车轨迹信息的功能
         """
-        if id not in self.pedestrian_traj.keys():
-            self.pedestrian_traj[id] = {}
-            self.pedestrian_traj[id]['shape'] = {}
-        if t not in self.pedestrian_traj[id].keys():
-            self.pedestrian_traj[id][t] = {}
-        for key, value in zip(['x', 'y', 'v', 'a', 'yaw'], [x, y, v, a, yaw]):
-            if value is not None:
-                self.pedestrian_traj[id][t][key] = value
-        for key, value in zip(['length', 'width'], [length, width]):
-            if value is not None:
-                self.pedestrian_traj[id]['shape'][key] = value
+        self.pedestrian_traj.add(id, t, x=x, y=y, v=v, a=a, yaw=yaw, length=length, width=width)
 
     def add_settings(self, dt=None, max_t=None):
         """
@@ -101,6 +74,12 @@ class ReplayInfo():
             if value is not None:
                 self.test_setting[key] = value
 
+    def frame_index(self, t: float) -> int:
+        """
+        该函数实现将仿真时刻t转换为整数帧序号的功能
+        """
+        return int(round(t / self.test_setting['dt']))
+
     def _add_vehicle_ego(self, x=None, y=None, v=None, a=None, yaw=None, length=None, width=None):
         """
         该函数实现向ego_info中增加主车信息的功能
@@ -112,14 +91,28 @@ class ReplayInfo():
 
     def _get_dt_maxt(self):
         """
-        该函数实现得到最大仿真时长阈值以及采样率的功能
+        该函数实现得到最大仿真时长阈值以及采样率的功能，并以该采样率构建各类交通参与者的轨迹数组
         """
         max_t = 0
-        for i in self.vehicle_traj.keys():
-            t_i = list(self.vehicle_traj[i].keys())
-            max_t_i = float(t_i[-1])
-            if max_t_i > max_t:
-                max_t = max_t_i
+        dt = None
+        for i in self.vehicle_traj.ids:
+            t_i = self.vehicle_traj.sample_times(i)
+            if t_i.size == 0:
+                continue
+            max_t = max(max_t, float(t_i[-1]))
+            if t_i.size > 1:
+                dt = np.around(float(t_i[-1]) - float(t_i[-2]), 3)
+        # 背景车辆均不足两个采样点时，以自行车、行人的轨迹确定采样间隔
+        for traj in [self.bicycle_traj, self.pedestrian_traj]:
+            for i in traj.ids:
+                if dt is not None:
+                    break
+                t_i = traj.sample_times(i)
+                if t_i.size > 1:
+                    dt = np.around(float(t_i[-1]) - float(t_i[-2]), 3)
+        if dt is None and any(traj.sample_times(i).size for traj in [self.vehicle_traj, self.bicycle_traj, self.pedestrian_traj] for i in traj.ids):
+            raise ValueError("Cannot determine sampling interval dt: no trajectory in the scenario has two or more samples!")
 
-        dt = np.around(float(t_i[-1]) - float(t_i[-2]), 3)
-        self.add_settings(dt=dt, max_t=max_t)
\ No newline at end of file
+        self.add_settings(dt=dt, max_t=max_t)
+        for traj in [self.vehicle_traj, self.bicycle_traj, self.pedestrian_traj]:
+            traj.build(self.test_setting['dt'])
@@ -1,94 +1,131 @@
 import json
-import xml.etree.ElementTree as ET
-import xml.dom.minidom
 import math
 import numpy as np
-import re
+from lxml import etree
 
 from utils.ScenarioManager.ScenarioInfo import ScenarioInfo
-from utils.opendrive2discretenet import parse_opendrive
+from utils.ScenarioManager.ScenarioBundle import ScenarioBundle
+from utils.opendrive2discretenet import parse_opendrive, NetworkCache, BORDER_MEMO_SIZE
 
 from .ReplayInfo import ReplayInfo
+from .TrajectoryStore import TrajectoryStore
+
+# 场景包中存储的轨迹类别，对应ReplayInfo中的<类别>_traj
+TRAJ_TYPES = ('vehicle', 'bicycle', 'pedestrian')
 
 
 class ReplayParser():
     """
     解析场景文件
     """
-    def __init__(self):
+    def __init__(self, memo_size: int = BORDER_MEMO_SIZE):
         self.replay_info = ReplayInfo()
+        # 解析路网时车道边界计算结果的缓存数量上限，对应配置项borderMemoSize
+        self.memo_size = memo_size
 
-    def parse(self, scenario_info: ScenarioInfo) -> ReplayInfo:
+    def parse(self, scenario_info: ScenarioInfo, use_bundle: bool = True) -> ReplayInfo:
+        """
+        解析场景，场景文件夹中存在未过期的场景包（见compile）时直接读取场景包，否则解析场景文件
+        """
         self.replay_info = ReplayInfo()
+        if use_bundle:
+            bundle = ScenarioBundle.open(scenario_info.source_file)
+            if bundle is not None:
+                try:
+                    self._parse_bundle(bundle)
+                    return self.replay_info
+                except (KeyError, ValueError, TypeError, OSError):
+                    self.replay_info = ReplayInfo()
         self._parse_opendrive(scenario_info.source_file['xodr'])
         self._parse_openscenario(scenario_info.source_file['xosc'])
         if scenario_info.source_file['json']:
             self._parse_light_json(scenario_info.source_file['json'])
         return self.replay_info
 
+    def compile(self, scenario_info: ScenarioInfo) -> str:
+        """
+        解析场景文件，并将轨迹数组、信号灯信息、离散化路网、地图范围及task_info写入场景包，返回场景包路径
+        """
+        replay_info = self.parse(scenario_info, use_bundle=False)
+        meta = {
+            'task_info': scenario_info.task_info,
+            'additional_info': scenario_info.additional_info,
+            'ego_info': replay_info.ego_info,
+            'test_setting': replay_info.test_setting,
+            'light_info': sorted(replay_info.light_info.items()),
+            'trajectories': {},
+        }
+        arrays = {f"road_{key}": value for key, value in NetworkCache.pack(replay_info.road_info).items()}
+        for traj_type in TRAJ_TYPES:
+            meta['trajectories'][traj_type], traj_arrays = getattr(replay_info, f"{traj_type}_traj").to_arrays()
+            arrays.update({f"{traj_type}_{name}": value for name, value in traj_arrays.items()})
+        return ScenarioBundle.write(scenario_info.source_file, meta, arrays)
+
+    def _parse_bundle(self, bundle: ScenarioBundle) -> None:
+        """
+        由场景包还原replay_info，轨迹数组与路网散点均为场景包的只读内存映射视图
+        """
+        meta = bundle.meta
+        self.replay_info.ego_info = meta['ego_info']
+        self.replay_info.test_setting = meta['test_setting']
+        self.replay_info.light_info = {frame: light for frame, light in meta['light_info']}
+        for traj_type in TRAJ_TYPES:
+            arrays = {name: bundle[f"{traj_type}_{name}"] for name in TrajectoryStore.ARRAYS}
+            setattr(self.replay_info, f"{traj_type}_traj", TrajectoryStore.from_arrays(meta['trajectories'][traj_type], arrays))
+        prefix = 'road_'
+        self.replay_info.road_info = NetworkCache.unpack({
+            name[len(prefix):]: bundle[name] for name in bundle.header['arrays'] if name.startswith(prefix)
+        })
+
     def _parse_light_json(self, file_dir: str) -> None:
         with open(file_dir, 'r') as read_f:
-            self.replay_info.light_info = json.load(read_f)
+            light_info = json.load(read_f)
+        # 信号灯信息以整数帧序号作为键，避免浮点数转字符串的格式差异，不落在仿真帧上的时刻不予保留
+        dt = self.replay_info.test_setting['dt']
+        self.replay_info.light_info = {
+            self.replay_info.frame_index(float(t)): light for t, light in light_info.items()
+            if abs(float(t) / dt - self.replay_info.frame_index(float(t))) < 1e-6
+        }
         return
 
     def _parse_openscenario(self, file_dir: str):
-        # 读取OpenScenario文件
-        opens = xml.dom.minidom.parse(file_dir).documentElement
-        open0_tree = ET.parse(file_dir)
-        open0 = open0_tree.getroot()
-        car_elements = open0.findall('.//Vehicle[@vehicleCategory="car"]')
-        bicycle_elements = open0.findall('.//Vehicle[@vehicleCategory="bicycle"]')
-        pedestrian_elements = open0.findall('.//Pedestrian[@pedestrianCategory="pedestrian"]')
-        car_num = 0
-        bicycle_num = 0
-        pedestrian_num = 0
-        # 读取车辆长度与宽度信息，录入replay_info。背景车id从1号开始
-        for car_element in car_elements:
-            # 获取 Dimensions 元素
-            dimensions_element = car_element.find('./BoundingBox/Dimensions')
-            if car_num == 0:
-                self.replay_info.add_vehicle(
-                    id="ego",
-                    t=-1,
-                    width=float(dimensions_element.get('width')),
-                    length=float(dimensions_element.get('length'))
-                )
-                car_num += 1
+        """以lxml.etree.iterparse单次流式读取OpenScenario文件
+            - 车辆、自行车、行人的尺寸按文件中出现的顺序读取，第一辆车为主车
+            - 主车初始状态记录在第一个Private节点的注释中
+            - 每个Act结束时即取出其全部轨迹点并释放该节点，背景要素按车辆、自行车、行人的顺序依次对应各Act
+        """
+        car_shapes, bicycle_shapes, pedestrian_shapes = [], [], []
+        ego_init = None
+        acts = []
+        for _, element in etree.iterparse(file_dir, events=('end',), tag=('Vehicle', 'Pedestrian', 'Private', 'Act')):
+            if element.tag == 'Vehicle':
+                category = element.get('vehicleCategory')
+                if category in ('car', 'bicycle'):
+                    shapes = car_shapes if category == 'car' else bicycle_shapes
+                    shapes.append(self._read_dimensions(element))
+            elif element.tag == 'Pedestrian':
+                if element.get('pedestrianCategory') == 'pedestrian':
+                    pedestrian_shapes.append(self._read_dimensions(element))
+            elif element.tag == 'Private':
+                if ego_init is None:
+                    # 与原先xml.dom.minidom读取的childNodes[3]一致，即第一个Private节点下的第二条注释
+                    ego_init = element[1].text
             else:
-                self.replay_info.add_vehicle(
-                    id="car"+str(car_num),
-                    t=-1,
-                    width=float(dimensions_element.get('width')),
-                    length=float(dimensions_element.get('length'))
-                )
-                car_num += 1
-
-        for bicycle_element in bicycle_elements:
-            # 获取 Dimensions 元素
-            dimensions_element = bicycle_element.find('./BoundingBox/Dimensions')
-            self.replay_info.add_bicycle(
-                id="bicycle"+str(bicycle_num+1),
-                t=-1,
-                width=float(dimensions_element.get('width')),
-                length=float(dimensions_element.get('length'))
-            )
-            bicycle_num += 1
-
-        for pedestrian_element in pedestrian_elements:
-            # 获取 Dimensions 元素
-            dimensions_element = pedestrian_element.find('./BoundingBox/Dimensions')
-            self.replay_info.add_pedestrian(
-                id="pedestrian"+str(pedestrian_num+1),
-                t=-1,
-                width=float(dimensions_element.get('width')),
-                length=float(dimensions_element.get('length'))
-            )
-            pedestrian_num += 1
+                acts.append(self._read_act(element))
+                # 轨迹点已读取，释放该Act及其之前的兄弟节点
+                element.clear()
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
 
+        # 读取车辆长度与宽度信息，录入replay_info。背景车id从1号开始
+        for car_num, (width, length) in enumerate(car_shapes):
+            self.replay_info.add_vehicle(id="car"+str(car_num) if car_num else "ego", t=-1, width=width, length=length)
+        for bicycle_num, (width, length) in enumerate(bicycle_shapes):
+            self.replay_info.add_bicycle(id="bicycle"+str(bicycle_num+1), t=-1, width=width, length=length)
+        for pedestrian_num, (width, length) in enumerate(pedestrian_shapes):
+            self.replay_info.add_pedestrian(id="pedestrian"+str(pedestrian_num+1), t=-1, width=width, length=length)
 
         # 读取本车信息, 记录为ego_v,ego_x,ego_y,ego_head
-        ego_node = opens.getElementsByTagName('Private')[0]
-        ego_init = ego_node.childNodes[3].data
         ego_v, ego_x, ego_y, ego_head = [float(i.split('=')[1]) for i in ego_init.split(',')]
         ego_v = abs(ego_v)
         ego_head = (ego_head + 2 * math.pi) if -math.pi <= ego_head < 0 else ego_head
@@ -103,130 +140,62 @@ class ReplayParser():
         )
         """以下读取背景车相关信息，车辆编号从1号开始，轨迹信息记录在vehicle_traj中"""
         """新版场景中采用更general的定义方式，在初始时仅初始化主车，背景车的采用Event中的AddEntityAction和DeleteEntityAction"""
-        act_list = opens.getElementsByTagName('Act')
-        for id, act in zip(np.arange(1, len(car_elements)), act_list):
-            # 记录OpenScenario中存在的位置、航向角、时间信息
-            t_list, x_list, y_list, yaw_list = [[] for i in range(4)]
-            for point in act.getElementsByTagName('Vertex'):
-                t_list.append(round(float(point.getAttribute('time')), 3))  # 记录时间，保留三位小数
-                loc = point.getElementsByTagName('WorldPosition')[0]
-                x_list.append(float(loc.getAttribute('x')))  # 记录横向位置
-                y_list.append(float(loc.getAttribute('y')))  # 记录纵向位置
-                yaw = float(loc.getAttribute('h'))  # 记录航向角
-                yaw = (yaw + 2 * math.pi) if -math.pi <= yaw < 0 else yaw  # 航向角范围调整到(0, 2pi)
-                yaw_list.append(yaw)
-            # 计算速度信息
-            x_diff = np.diff(x_list)  # 横向距离差
-            y_diff = np.diff(y_list)  # 纵向距离差
-            t_diff = np.diff(t_list)
-            v_list = np.sqrt(x_diff**2+y_diff**2)/t_diff  # 此时v维度比其他参数低
-            v_list = list(np.around(v_list, 2))  # 保留2位小数
-            v_list.append(v_list[-1])  # 补全维度
-            # 计算加速度信息
-            v_diff = np.diff(v_list)
-            a_list = v_diff/t_diff
-            a_list = list(np.around(a_list, 2))  # 保留2位小数
-            a_list.append(0.00)  # 补全维度
-            # 把时间t_list的内容以字符串形式保存，作为key
-            t_list = [str(t) for t in t_list]
-            for t, x, y, v, a, yaw in zip(t_list, x_list, y_list, v_list, a_list, yaw_list):
-                self.replay_info.add_vehicle(
-                    id="car"+str(id),
-                    t=t,
-                    x=round(x, 2),
-                    y=round(y, 2),
-                    v=round(v, 2),
-                    a=round(a, 2),
-                    yaw=round(yaw, 3)
-                )
-
-        for id, act in zip(np.arange(1, len(bicycle_elements)+1), act_list[len(car_elements)-1:len(bicycle_elements)+len(car_elements)-1]):
-            # 记录OpenScenario中存在的位置、航向角、时间信息
-            t_list, x_list, y_list, yaw_list = [[] for i in range(4)]
-            for point in act.getElementsByTagName('Vertex'):
-                t_list.append(round(float(point.getAttribute('time')), 3))  # 记录时间，保留三位小数
-                loc = point.getElementsByTagName('WorldPosition')[0]
-                x_list.append(float(loc.getAttribute('x')))  # 记录横向位置
-                y_list.append(float(loc.getAttribute('y')))  # 记录纵向位置
-                yaw = float(loc.getAttribute('h'))  # 记录航向角
-                yaw = (yaw + 2 * math.pi) if -math.pi <= yaw < 0 else yaw  # 航向角范围调整到(0, 2pi)
-                yaw_list.append(yaw)
-            # 计算速度信息
-            x_diff = np.diff(x_list)  # 横向距离差
-            y_diff = np.diff(y_list)  # 纵向距离差
-            t_diff = np.diff(t_list)
-            v_list = np.sqrt(x_diff**2+y_diff**2)/t_diff  # 此时v维度比其他参数低
-            v_list = list(np.around(v_list, 2))  # 保留2位小数
-            v_list.append(v_list[-1])  # 补全维度
-            # 计算加速度信息
-            v_diff = np.diff(v_list)
-            a_list = v_diff/t_diff
-            a_list = list(np.around(a_list, 2))  # 保留2位小数
-            a_list.append(0.00)  # 补全维度
-            # 把时间t_list的内容以字符串形式保存，作为key
-            t_list = [str(t) for t in t_list]
-            for t, x, y, v, a, yaw in zip(t_list, x_list, y_list, v_list, a_list, yaw_list):
-                self.replay_info.add_bicycle(
-                    id="bicycle"+str(id),
-                    t=t,
-                    x=round(x, 2),
-                    y=round(y, 2),
-                    v=round(v, 2),
-                    a=round(a, 2),
-                    yaw=round(yaw, 3)
-                )
-
-        for id, act in zip(np.arange(1 , len(pedestrian_elements)+1 ), act_list[len(bicycle_elements)+len(car_elements)-1 : len(pedestrian_elements) +len(bicycle_elements)+len(car_elements)-1]):
-            # 记录OpenScenario中存在的位置、航向角、时间信息
-            t_list, x_list, y_list, yaw_list = [[] for i in range(4)]
-            for point in act.getElementsByTagName('Vertex'):
-                t_list.append(round(float(point.getAttribute('time')), 3))  # 记录时间，保留三位小数
-                loc = point.getElementsByTagName('WorldPosition')[0]
-                x_list.append(float(loc.getAttribute('x')))  # 记录横向位置
-                y_list.append(float(loc.getAttribute('y')))  # 记录纵向位置
-                yaw = float(loc.getAttribute('h'))  # 记录航向角
-                yaw = (yaw + 2 * math.pi) if -math.pi <= yaw < 0 else yaw  # 航向角范围调整到(0, 2pi)
-                yaw_list.append(yaw)
-            # 计算速度信息
-            x_diff = np.diff(x_list)  # 横向距离差
-            y_diff = np.diff(y_list)  # 纵向距离差
-            t_diff = np.diff(t_list)
-            v_list = np.sqrt(x_diff**2+y_diff**2)/t_diff  # 此时v维度比其他参数低
-            v_list = list(np.around(v_list, 2))  # 保留2位小数
-            v_list.append(v_list[-1])  # 补全维度
-            # 计算加速度信息
-            v_diff = np.diff(v_list)
-            a_list = v_diff/t_diff
-            a_list = list(np.around(a_list, 2))  # 保留2位小数
-            a_list.append(0.00)  # 补全维度
-            # 把时间t_list的内容以字符串形式保存，作为key
-            t_list = [str(t) for t in t_list]
-            for t, x, y, v, a, yaw in zip(t_list, x_list, y_list, v_list, a_list, yaw_list):
-                self.replay_info.add_pedestrian(
-                    id="pedestrian"+str(id),
-                    t=t,
-                    x=round(x, 2),
-                    y=round(y, 2),
-                    v=round(v, 2),
-                    a=round(a, 2),
-                    yaw=round(yaw, 3)
-                )
+        num_cars = max(len(car_shapes) - 1, 0)
+        num_bicycles, num_pedestrians = len(bicycle_shapes), len(pedestrian_shapes)
+        for add, prefix, act_slice in [
+            (self.replay_info.add_vehicle, "car", acts[:num_cars]),
+            (self.replay_info.add_bicycle, "bicycle", acts[num_cars:num_cars + num_bicycles]),
+            (self.replay_info.add_pedestrian, "pedestrian", acts[num_cars + num_bicycles:num_cars + num_bicycles + num_pedestrians]),
+        ]:
+            for id, trajectory in enumerate(act_slice, start=1):
+                # 整条轨迹一次性写入轨迹数组
+                add(id=prefix+str(id), **trajectory)
+
         # 步长与最大时间
         self.replay_info._get_dt_maxt()
 
-        return self.replay_info
+    @staticmethod
+    def _read_dimensions(element) -> tuple:
+        """读取交通参与者的宽度与长度"""
+        dimensions_element = element.find('./BoundingBox/Dimensions')
+        return float(dimensions_element.get('width')), float(dimensions_element.get('length'))
+
+    @staticmethod
+    def _read_act(act) -> dict:
+        """读取一个Act中的全部轨迹点，并以数组运算计算速度与加速度"""
+        # 记录OpenScenario中存在的位置、航向角、时间信息
+        t_list, x_list, y_list, yaw_list = [[] for i in range(4)]
+        for point in act.iter('Vertex'):
+            t_list.append(round(float(point.get('time')), 3))  # 记录时间，保留三位小数
+            loc = next(point.iter('WorldPosition'))
+            x_list.append(float(loc.get('x')))  # 记录横向位置
+            y_list.append(float(loc.get('y')))  # 记录纵向位置
+            yaw_list.append(float(loc.get('h')))  # 记录航向角
+        x, y, yaw = np.array(x_list), np.array(y_list), np.array(yaw_list)
+        yaw = np.where((-math.pi <= yaw) & (yaw < 0), yaw + 2 * math.pi, yaw)  # 航向角范围调整到(0, 2pi)
+        # 计算速度信息，末尾补全维度
+        t_diff = np.diff(t_list)
+        v = np.around(np.sqrt(np.diff(x)**2 + np.diff(y)**2) / t_diff, 2)  # 保留2位小数
+        v = np.append(v, v[-1])
+        # 计算加速度信息，末尾补全维度
+        a = np.append(np.around(np.diff(v) / t_diff, 2), 0.0)
+        # x, y, yaw按Python内置round逐点取整，与原先的结果保持一致
+        return {
+            't': t_list,
+            'x': [round(value, 2) for value in x_list],
+            'y': [round(value, 2) for value in y_list],
+            'v': np.around(v, 2),
+            'a': np.around(a, 2),
+            'yaw': [round(value, 3) for value in yaw.tolist()],
+        }
 
     def _parse_opendrive(self, path_opendrive: str) -> None:
         """
         解析opendrive路网的信息，存储到self.replay_info.road_info
         """
-        self.replay_info.road_info = parse_opendrive(path_opendrive)
-
-        # 求出一个包含所有地图的矩形
-        points = np.empty(shape=[0, 2])
-        for discrete_lane in self.replay_info.road_info.discretelanes:
-            points = np.concatenate(
-                [discrete_lane.left_vertices, discrete_lane.right_vertices, discrete_lane.center_vertices, points],
-                axis=0)
-        self.replay_info.test_setting['map_range']['x'] = [np.min(points[:, 0]), np.max(points[:, 0])]
-        self.replay_info.test_setting['map_range']['y'] = [np.min(points[:, 1]), np.max(points[:, 1])]
\ No newline at end of file
+        self.replay_info.road_info = parse_opendrive(path_opendrive, memo_size=self.memo_size)
+
+        # 包含所有地图的矩形，解析路网时已逐车道求出
+        x_min, y_min, x_max, y_max = self.replay_info.road_info.bbox
+        self.replay_info.test_setting['map_range']['x'] = [x_min, x_max]
+        self.replay_info.test_setting['map_range']['y'] = [y_min, y_max]
\ No newline at end of file
@@ -0,0 +1,173 @@
+import numpy as np
+
+from utils.ScenarioManager.ScenarioInfo import ScenarioInfo
+from utils.collision import first_collision, to_boxes
+from utils.functions import check_action_batch, updateEgoPosBatch
+
+from .ReplayInfo import ReplayInfo
+from .ReplayParser import ReplayParser
+
+
+class ReplayVecEnv():
+    """
+    多场景同步步进的回放测试环境，用于提升规控算法训练时的交互吞吐量
+        - 同时加载num_envs个回放场景，每次step所有场景同时前进一帧
+        - 观测以堆叠后的数组形式返回，而非num_envs个Observation对象
+        - 动力学约束修正、主车状态更新与测试终止判断均以数组运算批量完成
+        - 测试终止的场景自动重置为任务队列中的下一个场景
+    """
+    EGO_FIELDS = ('x', 'y', 'v', 'a', 'yaw', 'rot', 'length', 'width')
+    OBJECT_FIELDS = ('x', 'y', 'v', 'a', 'yaw', 'length', 'width')
+    OBJECT_TYPES = ('vehicle', 'bicycle', 'pedestrian')
+
+    def __init__(self, scene_infos: list, num_envs: int, max_objects: int = 64, cache: bool = True):
+        """
+        Args:
+            scene_infos (list): 回放测试任务的ScenarioInfo列表，各环境按顺序循环取用
+            num_envs (int): 同时运行的场景数量
+            max_objects (int, optional): 观测中每个场景保留的背景要素数量上限，超出时保留距离主车最近的背景要素. Defaults to 64.
+            cache (bool, optional): 是否缓存已解析的场景，避免重复解析路网与轨迹. Defaults to True.
+        """
+        assert scene_infos, "ReplayVecEnv needs at least one scenario!"
+        self.scene_infos = scene_infos
+        self.num_envs = num_envs
+        self.max_objects = max_objects
+        self.cache = cache
+        self.parser = ReplayParser()
+        self._replay_cache = {}
+        self._next_task = 0
+
+        self.scenes = [ScenarioInfo() for _ in range(num_envs)]
+        self.replays = [ReplayInfo() for _ in range(num_envs)]
+        self.ego = np.zeros((num_envs, len(self.EGO_FIELDS)))
+        self.frame = np.zeros(num_envs, dtype=np.int64)
+        self.t = np.zeros(num_envs)
+        self.dt = np.zeros(num_envs)
+        self.max_t = np.zeros(num_envs)
+        self.map_range = np.zeros((num_envs, 2, 2))
+        self.target = np.zeros((num_envs, 2, 2))
+        self.end = np.full(num_envs, -1)
+        self.objects = np.zeros((num_envs, max_objects, len(self.OBJECT_FIELDS)))
+        self.object_mask = np.zeros((num_envs, max_objects), dtype=bool)
+        self.object_type = np.zeros((num_envs, max_objects), dtype=np.int8)
+
+    def reset(self) -> dict:
+        """重置全部环境，返回初始观测"""
+        for env in range(self.num_envs):
+            self._reset_env(env)
+        self._update_frames(np.arange(self.num_envs))
+        return self.get_observation()
+
+    def step(self, actions: np.ndarray):
+        """所有环境同步前进一帧
+        Args:
+            actions (np.ndarray): (num_envs, 2) 各主车的纵向加速度与前轮转角
+        Returns:
+            observation (dict): 堆叠后的观测，已终止的环境为重置后新场景的初始观测
+            end (np.ndarray): (num_envs,) 本帧的测试终止状态码，-1表示测试仍在进行
+            info (dict): names为本帧对应的场景名称，final_ego为终止时刻的主车状态
+        """
+        ego_action = check_action_batch(self.dt, self.ego[:, 2], self.ego[:, [3, 5]], actions)
+        updateEgoPosBatch(ego_action, self.dt, self.ego)
+        self.frame += 1
+        self.t = np.round(self.frame * self.dt, 3)
+        self._update_frames(np.arange(self.num_envs))
+
+        end = self.end.copy()
+        info = {'names': [scene.name for scene in self.scenes], 'final_ego': self.ego.copy()}
+        done = np.flatnonzero(end != -1)
+        for env in done:
+            self._reset_env(env)
+        if done.size:
+            self._update_frames(done)
+        return self.get_observation(), end, info
+
+    def get_observation(self) -> dict:
+        """以数组形式返回当前观测，返回值为副本，规控器无法修改环境状态"""
+        return {
+            'ego': self.ego.copy(),
+            'objects': self.objects.copy(),
+            'object_mask': self.object_mask.copy(),
+            'object_type': self.object_type.copy(),
+            't': self.t.copy(),
+            'end': self.end.copy(),
+        }
+
+    def _load(self, scene_info: ScenarioInfo) -> ReplayInfo:
+        key = scene_info.source_file['xosc']
+        if key in self._replay_cache:
+            return self._replay_cache[key]
+        replay_info = self.parser.parse(scene_info)
+        if self.cache:
+            self._replay_cache[key] = replay_info
+        return replay_info
+
+    def _reset_env(self, env: int) -> None:
+        scene_info = self.scene_infos[self._next_task % len(self.scene_infos)]
+        self._next_task += 1
+        replay_info = self._load(scene_info)
+        self.scenes[env] = scene_info
+        self.replays[env] = replay_info
+
+        ego_info = dict(replay_info.ego_info, rot=0)
+        ego_info['yaw'] = ego_info['yaw'] % (2 * np.pi)
+        self.ego[env] = np.round([ego_info[key] for key in self.EGO_FIELDS], 3)
+        self.frame[env] = 0
+        self.t[env] = 0
+        self.dt[env] = scene_info.task_info['dt']
+        self.max_t[env] = replay_info.test_setting['max_t']
+        self.map_range[env] = [
+            [replay_info.test_setting['map_range']['x'][0], replay_info.test_setting['map_range']['y'][0]],
+            [replay_info.test_setting['map_range']['x'][1], replay_info.test_setting['map_range']['y'][1]],
+        ]
+        self.target[env] = scene_info.task_info['targetPos']
+
+    def _update_frames(self, envs: np.ndarray) -> None:
+        """更新指定环境的背景要素状态及测试终止状态"""
+        collide = np.zeros(self.num_envs, dtype=bool)
+        for env in envs:
+            replay_info = self.replays[env]
+            frame = replay_info.frame_index(self.t[env])
+            states, types = [], []
+            for type_id, obj_type in enumerate(self.OBJECT_TYPES):
+                _, state, shape = getattr(replay_info, f"{obj_type}_traj").get_frame(frame)
+                states.append(np.concatenate([state, shape], axis=1))
+                types.append(np.full(len(state), type_id, dtype=np.int8))
+            states, types = np.concatenate(states), np.concatenate(types)
+            states[:, 4] = states[:, 4] % (2 * np.pi)
+            states = np.round(states, 3)
+
+            # 数据问题导致部分车辆初始位置有重叠，0.5s以内不判断碰撞
+            if self.t[env] > 0.5:
+                collide[env] = self._detect_collision(self.ego[env], states)
+
+            # 超出观测数量上限时保留距离主车最近的背景要素
+            if len(states) > self.max_objects:
+                dist = np.hypot(states[:, 0] - self.ego[env, 0], states[:, 1] - self.ego[env, 1])
+                keep = np.sort(np.argpartition(dist, self.max_objects)[:self.max_objects])
+                states, types = states[keep], types[keep]
+            num = len(states)
+            self.objects[env] = 0
+            self.objects[env, :num] = states
+            self.object_mask[env] = False
+            self.object_mask[env, :num] = True
+            self.object_type[env] = 0
+            self.object_type[env, :num] = types
+
+        self._update_end_status(envs, collide)
+
+    def _detect_collision(self, ego: np.ndarray, states: np.ndarray) -> bool:
+        return first_collision(to_boxes(ego, self.EGO_FIELDS), to_boxes(states, self.OBJECT_FIELDS)) != -1
+
+    def _update_end_status(self, envs: np.ndarray, collide: np.ndarray) -> None:
+        """与ReplayController._update_end_status的判断顺序保持一致，后判断的状态码优先"""
+        x, y = self.ego[envs, 0], self.ego[envs, 1]
+        map_range, target = self.map_range[envs], self.target[envs]
+        status = np.full(len(envs), -1)
+        inside_map = (map_range[:, 0, 0] <= x) & (x <= map_range[:, 1, 0]) & (map_range[:, 0, 1] <= y) & (y <= map_range[:, 1, 1])
+        status = np.where(~inside_map, 4, status)
+        status = np.where(self.t[envs] >= self.max_t[envs], 2, status)
+        status = np.where(collide[envs], 3, status)
+        arrived = (target[:, 0, 0] <= x) & (x <= target[:, 1, 0]) & (target[:, 0, 1] <= y) & (y <= target[:, 1, 1])
+        status = np.where(arrived, 1, status)
+        self.end[envs] = status
@@ -0,0 +1,159 @@
+import numpy as np
+
+
+class TrajectoryStore():
+    """
+    按类别存储回放场景中背景要素轨迹的列式容器
+        data:  (agent, frame, field) 连续数组，field顺序见FIELDS
+        valid: (agent, frame) 布尔数组，表示该交通参与者在该帧是否存在
+        shape: (agent, 2) 数组，依次为length、width
+        frame_ptr/frame_rows: 按帧排列的存在交通参与者行号（CSR形式），第k帧为frame_rows[frame_ptr[k]:frame_ptr[k+1]]
+    帧序号frame = round(t / dt)，对应data中的第frame - frame_offset列，取代原先以str(t)作为键的逐帧字典
+    """
+    FIELDS = ('x', 'y', 'v', 'a', 'yaw')
+    SHAPE_FIELDS = ('length', 'width')
+    ARRAYS = ('data', 'valid', 'shape', 'frame_ptr', 'frame_rows')
+
+    def __init__(self):
+        self.ids = []
+        self.index = {}
+        self.dt = float('nan')
+        self.frame_offset = 0
+        self.data = np.zeros((0, 0, len(self.FIELDS)))
+        self.valid = np.zeros((0, 0), dtype=bool)
+        self.shape = np.zeros((0, len(self.SHAPE_FIELDS)))
+        self.frame_ptr = np.zeros(1, dtype=np.int64)
+        self.frame_rows = np.zeros(0, dtype=np.int64)
+        # 解析阶段暂存的轨迹片段，调用build后合并为连续数组
+        self._pending = {}
+        self._pending_shape = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, id):
+        return id in self.index
+
+    def __str__(self):
+        return f"<TrajectoryStore agents={len(self.ids)} frames={self.valid.shape[1]} dt={self.dt}>"
+
+    @property
+    def num_frames(self) -> int:
+        return self.valid.shape[1]
+
+    def _register(self, id):
+        if id not in self.index:
+            self.index[id] = len(self.ids)
+            self.ids.append(id)
+            self._pending[id] = []
+            self._pending_shape[id] = {}
+
+    def add(self, id, t, **kwargs):
+        """
+        添加交通参与者的轨迹点，t及各字段既可以是标量也可以是等长数组，值为None的字段不写入
+        """
+        self._register(id)
+        for key in self.SHAPE_FIELDS:
+            if kwargs.get(key) is not None:
+                self._pending_shape[id][key] = float(kwargs[key])
+        fields = {key: kwargs[key] for key in self.FIELDS if kwargs.get(key) is not None}
+        if fields:
+            t = np.atleast_1d(np.asarray(t, dtype=float))
+            self._pending[id].append((t, {key: np.broadcast_to(np.asarray(value, dtype=float), t.shape) for key, value in fields.items()}))
+
+    def sample_times(self, id) -> np.ndarray:
+        """
+        返回某一交通参与者已添加的全部采样时刻（升序）
+        """
+        chunks = self._pending.get(id, [])
+        if not chunks:
+            return np.zeros(0)
+        return np.unique(np.concatenate([t for t, _ in chunks]))
+
+    def build(self, dt: float) -> None:
+        """
+        以步长dt将暂存的轨迹片段合并为连续数组
+        """
+        self.dt = float(dt)
+        frames = {
+            id: [np.rint(t / self.dt).astype(np.int64) for t, _ in chunks]
+            for id, chunks in self._pending.items()
+        }
+        all_frames = [f for chunk_frames in frames.values() for f in chunk_frames if f.size]
+        if all_frames:
+            min_frame = min(int(f.min()) for f in all_frames)
+            max_frame = max(int(f.max()) for f in all_frames)
+        else:
+            min_frame, max_frame = 0, -1
+        self.frame_offset = min_frame
+        num_frames = max_frame - min_frame + 1
+
+        self.data = np.zeros((len(self.ids), num_frames, len(self.FIELDS)))
+        self.valid = np.zeros((len(self.ids), num_frames), dtype=bool)
+        self.shape = np.zeros((len(self.ids), len(self.SHAPE_FIELDS)))
+        for row, id in enumerate(self.ids):
+            for (_, fields), chunk_frames in zip(self._pending[id], frames[id]):
+                cols = chunk_frames - self.frame_offset
+                self.valid[row, cols] = True
+                for key, value in fields.items():
+                    self.data[row, cols, self.FIELDS.index(key)] = value
+            for key, value in self._pending_shape[id].items():
+                self.shape[row, self.SHAPE_FIELDS.index(key)] = value
+        # 预先建立逐帧的存在交通参与者索引，使每帧查询只与该帧的交通参与者数量有关
+        frame_cols, rows = np.nonzero(self.valid.T)
+        self.frame_ptr = np.concatenate([[0], np.cumsum(np.bincount(frame_cols, minlength=num_frames))])
+        self.frame_rows = rows
+        self._pending = {id: [] for id in self.ids}
+
+    def to_arrays(self):
+        """
+        导出build后的轨迹数组，用于写入场景包
+        Returns:
+            meta (dict): 可JSON序列化的ids、dt、frame_offset
+            arrays (dict): ARRAYS中各数组
+        """
+        meta = {'ids': list(self.ids), 'dt': self.dt, 'frame_offset': int(self.frame_offset)}
+        return meta, {name: getattr(self, name) for name in self.ARRAYS}
+
+    @classmethod
+    def from_arrays(cls, meta: dict, arrays: dict) -> 'TrajectoryStore':
+        """
+        由to_arrays导出的内容直接还原，数组不复制（可为只读的内存映射视图）
+        """
+        store = cls()
+        for id in meta['ids']:
+            store._register(id)
+        store.dt = float(meta['dt'])
+        store.frame_offset = int(meta['frame_offset'])
+        for name in cls.ARRAYS:
+            setattr(store, name, arrays[name])
+        store._pending = {id: [] for id in store.ids}
+        return store
+
+    def frame_index(self, t: float) -> int:
+        """
+        将仿真时刻t转换为帧序号
+        """
+        return int(round(t / self.dt))
+
+    def get_frame(self, frame: int):
+        """
+        取出第frame帧存在的全部交通参与者
+        Returns:
+            rows (np.ndarray): 交通参与者在data中的行号
+            states (np.ndarray): (n, 5) 对应的x, y, v, a, yaw
+            shapes (np.ndarray): (n, 2) 对应的length, width
+        """
+        col = frame - self.frame_offset
+        if not 0 <= col < self.num_frames:
+            return np.zeros(0, dtype=np.int64), np.zeros((0, len(self.FIELDS))), np.zeros((0, len(self.SHAPE_FIELDS)))
+        rows = self.frame_rows[self.frame_ptr[col]:self.frame_ptr[col + 1]]
+        return rows, self.data[rows, col], self.shape[rows]
+
+    def iter_frame(self, frame: int):
+        """
+        逐个返回第frame帧存在的交通参与者的(id, 状态字典)
+        """
+        rows, states, shapes = self.get_frame(frame)
+        for row, state, shape in zip(rows.tolist(), states.tolist(), shapes.tolist()):
+            yield self.ids[row], dict(zip(self.FIELDS + self.SHAPE_FIELDS, state + shape))
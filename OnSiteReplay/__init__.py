@@ -1,31 +1,42 @@
+import time
+from multiprocessing import Pool
+
 from utils.ScenarioManager.ScenarioInfo import ScenarioInfo
 from utils.recorder import Recorder
 from utils.functions import check_action
+from utils.opendrive2discretenet import BORDER_MEMO_SIZE
 
 from .ReplayController import ReplayController
+from .ReplayInfo import ReplayInfo
+from .ReplayParser import ReplayParser
+from .ReplayVecEnv import ReplayVecEnv
+
+def prepare(scene_info: ScenarioInfo, memo_size: int = BORDER_MEMO_SIZE) -> ReplayInfo:
+    """解析回放测试场景，可作为ScenarioManager.prepare在后台线程中预先解析后续场景"""
+    return ReplayParser(memo_size).parse(scene_info)
 
-def run(mode_config: dict, planner: object, scene_info: ScenarioInfo) -> None:
+def run(mode_config: dict, planner: object, scene_info: ScenarioInfo, replay_info: ReplayInfo = None) -> int:
     # 实例化回放测试流程控制模块
-    controller = ReplayController(mode_config['visualize'])
+    controller = ReplayController(mode_config['visualize'], mode_config.get('continuousCollision', False), mode_config.get('borderMemoSize', BORDER_MEMO_SIZE))
     # 实例化测试记录模块
-    recorder = Recorder()
+    recorder = Recorder(mode_config, scene_info.output_path)
     # 用于记录归控模块回传的控制信息
     action = [float('nan'), float('nan')]
 
     # 回放测试流程控制模块初始化，在observation中加载主车信息及测试环境信息
-    controller.init(scene_info)
+    controller.init(scene_info, replay_info)
     # 被测物根据场景信息进行初始化设置
     planner.init(scene_info.format())
 
     while True:
         # 更新测试场景背景要素状态及仿真运行状态
         controller.update_frame()
-        # 记录当前测试信息
-        recorder.record(action, controller.get_observation())
+        # 记录当前测试信息，记录模块只读取当前观测，无需复制
+        recorder.record(action, controller.observation)
         # 判断仿真是否还在进行中
         if controller.observation.test_info['end'] != -1:
             # 如果仿真结束则输出记录的测试信息
-            recorder.output(scene_info.output_path)
+            recorder.output(scene_info.output_path, scene_info)
             break
         # 如果仿真还在运行，则获取规控模块回传的控制信息
         action = planner.act(controller.get_observation())
@@ -38,6 +49,33 @@ def run(mode_config: dict, planner: object, scene_info: ScenarioInfo) -> None:
         )
         # 根据修正后的控制量更新主车位置
         controller.update_ego(ego_action)
+    # 返回测试终止状态码
+    return controller.observation.test_info['end']
+
+def _run_task(args: tuple) -> dict:
+    """在子进程中运行单个回放测试任务，每个任务使用独立的规控器实例"""
+    mode_config, planner_cls, scene_info = args
+    result = {'num': scene_info.num, 'name': scene_info.name, 'output_path': scene_info.output_path, 'end': None, 'time': 0, 'error': ""}
+    tic = time.time()
+    try:
+        result['end'] = run(mode_config, planner_cls(), scene_info)
+    except Exception as e:
+        result['error'] = repr(e)
+    result['time'] = round(time.time() - tic, 1)
+    return result
+
+def run_batch(mode_config: dict, planner_cls: type, scene_infos: list, workers: int):
+    """使用进程池并行运行多个回放测试任务
+    Args:
+        mode_config (dict): 测试配置
+        planner_cls (type): 规控器类，每个任务在子进程中单独实例化
+        scene_infos (list): 待测试的ScenarioInfo列表
+        workers (int): 并行进程数
+    Yields:
+        dict: 每个任务完成后的测试结果，包含num, name, output_path, end, time, error
+    """
+    with Pool(processes=workers) as pool:
+        yield from pool.imap_unordered(_run_task, [(mode_config, planner_cls, scene_info) for scene_info in scene_infos])
 
 if __name__ == '__main__':
-    run('serial', {'tasks': ['Cyz_TJST_1.json', 'Cyz_TJST_2.json']})
\ No newline at end of file
+    run('serial', {'tasks': ['Cyz_TJST_1.json', 'Cyz_TJST_2.json']})
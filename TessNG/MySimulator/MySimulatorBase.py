@@ -1,6 +1,5 @@
 import os
 import math
-import copy
 import time
 
 import utils.observation
@@ -9,8 +8,9 @@ from ..DLLs.Tessng import *
 
 from utils.ScenarioManager.ScenarioInfo import ScenarioInfo
 from utils.recorder import Recorder
+from utils.collision import BroadPhase
 from utils.observation import Observation, EgoStatus
-from utils.functions import convertAngle, calcDistance, testFinish, check_action, updateEgoPos, kill_process
+from utils.functions import convertAngle, testFinish, check_action, updateEgoPos, kill_process
 from utils.netStruct import paintPos, startEndPos, waypoints
 from utils.externVehicleLogic import ExternVehicleLogic
 
@@ -34,6 +34,10 @@ class MySimulatorBase(QObject, PyCustomerSimulator):
 		self.preheatingTime = 5
 		# 背景车探测范围
 		self.radius = 50
+		# 是否检测相邻两帧之间的碰撞
+		self.continuousCollision = False
+		# 用于连续碰撞检测的上一帧观测
+		self.prevObservation = None
 
 		# 测试场景信息
 		self.scenario_info = ScenarioInfo()
@@ -100,27 +104,33 @@ class MySimulatorBase(QObject, PyCustomerSimulator):
 		# 添加主车信息
 		new_observation.ego_info = self.ego_info
 		self.trans_ego_to_extern(self.ego_info)
-		# 添加背景车信息
+		# 添加背景车信息，先以BroadPhase筛选出主车radius范围内的背景车，再收集完整帧后一次写入observation
+		background = []
 		for vehicleStatus in lAllVehiStatus:
 			if vehicleStatus.id() != self.ego_id:
-				if calcDistance([self.ego_info.x, self.ego_info.y],
-								[p2m(vehicleStatus.pos().x()), -p2m(vehicleStatus.pos().y())]) < self.radius:
-					new_observation.update_object_info(
-						'vehicle',
-						self.vehicleMap.get(vehicleStatus.id(), str(vehicleStatus.id())),
-						length=p2m(vehicleStatus.length()),
-						width=2.02,
-						x=p2m(vehicleStatus.pos().x()),
-						y=-p2m(vehicleStatus.pos().y()),
-						v=p2m(vehicleStatus.currSpeed()),
-						a=p2m(vehicleStatus.acce()),
-						yaw=math.radians(convertAngle(vehicleStatus.angle())),
-					)
-					tessngSimuiface.getVehicle(vehicleStatus.id()).setColor("#C318FF")
-				else:
-					tessngSimuiface.getVehicle(vehicleStatus.id()).setColor("#F8F8FF")
+				background.append(vehicleStatus)
 			else:
 				tessngSimuiface.getVehicle(vehicleStatus.id()).setColor("#00BFFF")
+		positions = [[p2m(vehicleStatus.pos().x()), -p2m(vehicleStatus.pos().y())] for vehicleStatus in background]
+		nearby = set(BroadPhase(positions).query_radius([self.ego_info.x, self.ego_info.y], self.radius).tolist())
+		vehicle_ids, vehicle_states = [], []
+		for idx, vehicleStatus in enumerate(background):
+			if idx in nearby:
+				vehicle_ids.append(self.vehicleMap.get(vehicleStatus.id(), str(vehicleStatus.id())))
+				# 顺序与ObjectStatus.FIELDS一致
+				vehicle_states.append([
+					positions[idx][0],
+					positions[idx][1],
+					p2m(vehicleStatus.currSpeed()),
+					p2m(vehicleStatus.acce()),
+					math.radians(convertAngle(vehicleStatus.angle())),
+					2.02,
+					p2m(vehicleStatus.length()),
+				])
+				tessngSimuiface.getVehicle(vehicleStatus.id()).setColor("#C318FF")
+			else:
+				tessngSimuiface.getVehicle(vehicleStatus.id()).setColor("#F8F8FF")
+		new_observation.update_objects('vehicle', vehicle_ids, vehicle_states)
 
 		# 更新测试结束信息
 		if tessngSimuiface.simuTimeIntervalWithAcceMutiples() >= self.preheatingTime * 1000 + 3000:
@@ -128,11 +138,15 @@ class MySimulatorBase(QObject, PyCustomerSimulator):
 				goal=self.scenario_info.task_info['targetPos'],
 				observation=new_observation,
 				outOfTime=(currentTestTime / 1000) >= self.maxTestTime,
-				outOfMap=self.outSideTessngNet
+				outOfMap=self.outSideTessngNet,
+				prev_observation=self.prevObservation
 			)
 		else:
 			end = -1
 		new_observation.update_test_info(t=currentTestTime / 1000, dt=self.dt, end=end)
+		if self.continuousCollision:
+			# 主车状态会在本帧规控后原地更新，需保存快照
+			self.prevObservation = new_observation.snapshot()
 		return new_observation
 
 	def _createVehicle(self, simuiface: SimuInterface, netiface: NetInterface, veh_info: dict):
@@ -199,7 +213,7 @@ class MySimulatorBase(QObject, PyCustomerSimulator):
 					# 记录当前测试信息
 					self.recorder.record(self.action, self.observation)
 					# 获取规控模块回传的控制信息
-					self.action = self.planner.act(self.observation)
+					self.action = self.planner.act(self.get_observation())
 					# 对规控器回传的控制信息进行执行器动力学约束修正
 					ego_action = check_action(
 						dt=self.dt,
@@ -305,12 +319,12 @@ class MySimulatorBase(QObject, PyCustomerSimulator):
 
 	def afterStop(self):
 		# 输出测试结果
-		self.recorder.output(self.scenario_info.output_path)
+		self.recorder.output(self.scenario_info.output_path, self.scenario_info)
 		# 退出仿真
 		kill_process(os.getpid())
 
 	def get_observation(self):
-		return copy.deepcopy(self.observation)
+		return self.observation.snapshot()
 
 	def trans_ego_to_extern(self, ego_info):
 		iface = tessngIFace()
@@ -2,6 +2,7 @@ from .MySimulatorBase import MySimulatorBase
 from ..DLLs.Tessng import *
 
 from utils.ScenarioManager.ScenarioInfo import ScenarioInfo
+from utils.recorder import Recorder
 from utils.functions import getTessNGCarLength
 
 # 片段式仿真测试模块
@@ -9,6 +10,9 @@ class MySimulatorFragment(MySimulatorBase):
     def __init__(self, config: dict, planner: object, scene_info: ScenarioInfo):
         MySimulatorBase.__init__(self)
 
+        # 测试记录模块
+        self.recorder = Recorder(config, scene_info.output_path)
+
         # 最大测试时长
         self.maxTestTime = config.get('maxTestTime', 30)
         # 实例化规控器并初始化
@@ -22,6 +26,8 @@ class MySimulatorFragment(MySimulatorBase):
         self.preheatingTime = 0
         # 背景车探测范围
         self.radius = 50
+        # 是否检测相邻两帧之间的碰撞
+        self.continuousCollision = config.get('continuousCollision', False)
 
     def _addCar(self, simuiface: SimuInterface, netiface: NetInterface):
         for veh_id, veh_info in self.scenario_info.additional_info['vehicle_init_status'].items():
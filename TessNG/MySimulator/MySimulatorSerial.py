@@ -2,11 +2,15 @@ from .MySimulatorBase import MySimulatorBase
 from ..DLLs.Tessng import *
 
 from utils.ScenarioManager.ScenarioInfo import ScenarioInfo
+from utils.recorder import Recorder
 
 class MySimulatorSerial(MySimulatorBase):
     def __init__(self, config: dict, planner: object, scene_info: ScenarioInfo):
         MySimulatorBase.__init__(self)
 
+        # 测试记录模块
+        self.recorder = Recorder(config, scene_info.output_path)
+
         # 测试间隔
         self.dt = config.get('dt', 0.05)
         # 最大测试时长
@@ -20,6 +24,8 @@ class MySimulatorSerial(MySimulatorBase):
         self.preheatingTime = 5
         # 背景车探测范围
         self.radius = 50
+        # 是否检测相邻两帧之间的碰撞
+        self.continuousCollision = config.get('continuousCollision', False)
 
     def _addCar(self, simuiface: SimuInterface, netiface: NetInterface):
         ego_info = {
@@ -2,16 +2,21 @@
 # 添加本开发包绝对路径到搜索路径中
 import os
 import sys
+import time
+import shutil
 from multiprocessing import Process
+from multiprocessing.connection import wait
 
 from .MyPlugin import MyPlugin
 from .TESS_API_EXAMPLE import *
 
 from utils.ScenarioManager.ScenarioInfo import ScenarioInfo
+from utils.recorder import recover_result
 
-def startTessNG(mode: str, mode_config: dict, planner: object, scene_info: ScenarioInfo, auto_run: bool) -> None:
+WORKSPACE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'WorkSpace')
+
+def startTessNG(mode: str, mode_config: dict, planner: object, scene_info: ScenarioInfo, auto_run: bool, workspace_dir: str = WORKSPACE_DIR) -> None:
     # 创建工作目录
-    workspace_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'WorkSpace')
     if not os.path.exists(workspace_dir):
         os.makedirs(workspace_dir)
     # 启动TessNG并传入测试相关参数
@@ -33,6 +38,29 @@ def startTessNG(mode: str, mode_config: dict, planner: object, scene_info: Scena
     else:
         sys.exit(app.exec_())
 
+def prepare_workspace(slot: int) -> str:
+    """为第slot个并行的TessNG实例准备独立的工作目录，并从默认工作目录复制激活证书"""
+    workspace_dir = os.path.join(os.path.dirname(WORKSPACE_DIR), 'WorkSpaces', str(slot))
+    cert_dir = os.path.join(WORKSPACE_DIR, 'Cert')
+    if os.path.exists(cert_dir) and not os.path.exists(os.path.join(workspace_dir, 'Cert')):
+        shutil.copytree(cert_dir, os.path.join(workspace_dir, 'Cert'))
+    os.makedirs(workspace_dir, exist_ok=True)
+    return workspace_dir
+
+def start(mode: str, mode_config: dict, planner: object, scene_info: ScenarioInfo, auto_run: bool = True, workspace_dir: str = WORKSPACE_DIR) -> Process:
+    """在子进程中启动TessNG，不等待测试结束"""
+    tessng_p = Process(target=startTessNG, args=(mode, mode_config, planner, scene_info, auto_run, workspace_dir))
+    tessng_p.start()
+    return tessng_p
+
+def stop(tessng_p: Process, mode_config: dict, scene_info: ScenarioInfo) -> None:
+    """终止仍在运行的TessNG进程（超时），并将已写出的分块记录恢复为带有截断标记的结果文件"""
+    if tessng_p.is_alive():
+        tessng_p.terminate()
+        tessng_p.join()
+    if scene_info.output_path and not os.path.exists(scene_info.output_path):
+        recover_result(scene_info.output_path, mode_config, scene_info)
+
 def run(mode: str, mode_config: dict, planner: object=None, scene_info: ScenarioInfo=ScenarioInfo(), auto_run: bool=True) -> None:
     """启动TessNG进行测试
     Args:
@@ -42,17 +70,68 @@ def run(mode: str, mode_config: dict, planner: object=None, scene_info: Scenario
         scene_info (ScenarioInfo, optional): 测试场景信息. Defaults to ScenarioInfo().
         auto_run (bool, optional): 是否自动运行测试. Defaults to True.
     """
-    tessng_p = Process(target=startTessNG, args=(mode, mode_config, planner, scene_info, auto_run))
-    tessng_p.start()
+    tessng_p = start(mode, mode_config, planner, scene_info, auto_run)
 
     if mode == "FRAGMENT":
         timeout = mode_config.get('timeout', 600)
         tessng_p.join(timeout)
         if tessng_p.is_alive():
-            tessng_p.terminate()
+            # 超时终止时将已写出的分块记录恢复为带有截断标记的结果文件
+            stop(tessng_p, mode_config, scene_info)
             raise TimeoutError(f"Timeout: TessNG process is still running after {timeout} seconds.")
     else:
         tessng_p.join()
+    # TessNG进程异常退出时恢复已写出的分块记录
+    stop(tessng_p, mode_config, scene_info)
+
+def run_batch(mode: str, mode_config: dict, planner_cls: type, scene_infos, workers: int):
+    """同时运行至多workers个TessNG实例，每个实例使用独立的工作目录，任一实例结束后即启动下一个测试任务
+    Args:
+        mode (str): 测试模式，FRAGMENT模式下单个任务运行超过mode_config['timeout']（默认600s）时终止
+        mode_config (dict): 测试配置
+        planner_cls (type): 规控器类，每个任务单独实例化
+        scene_infos (Iterable[ScenarioInfo]): 待测试的场景，按需逐个取出
+        workers (int): 同时运行的TessNG实例数
+    Yields:
+        dict: 每个任务结束后的测试结果，包含num, name, output_path, time, error
+    """
+    timeout = mode_config.get('timeout', 600) if mode == "FRAGMENT" else None
+    scene_infos = iter(scene_infos)
+    free_slots = list(range(workers))[::-1]
+    running = {}  # sentinel -> (slot, tessng_p, scene_info, tic)
+    exhausted = False
+    while running or not exhausted:
+        # 有空闲实例时启动新的测试任务
+        while free_slots and not exhausted:
+            scene_info = next(scene_infos, None)
+            if scene_info is None:
+                exhausted = True
+                break
+            slot = free_slots.pop()
+            tessng_p = start(mode, mode_config, planner_cls(), scene_info, workspace_dir=prepare_workspace(slot))
+            running[tessng_p.sentinel] = (slot, tessng_p, scene_info, time.time())
+        if not running:
+            break
+
+        # 等待任一实例结束或最早启动的实例超时
+        wait_time = None
+        if timeout is not None:
+            wait_time = max(min(tic for _, _, _, tic in running.values()) + timeout - time.time(), 0)
+        finished = set(wait(list(running), timeout=wait_time))
+        for sentinel, (slot, tessng_p, scene_info, tic) in list(running.items()):
+            timed_out = timeout is not None and time.time() - tic >= timeout
+            if sentinel not in finished and not timed_out:
+                continue
+            error = ""
+            if sentinel in finished:
+                tessng_p.join()
+            else:
+                error = repr(TimeoutError(f"Timeout: TessNG process is still running after {timeout} seconds."))
+            # 终止超时的实例，并恢复异常退出或超时实例已写出的分块记录
+            stop(tessng_p, mode_config, scene_info)
+            del running[sentinel]
+            free_slots.append(slot)
+            yield {'num': scene_info.num, 'name': scene_info.name, 'output_path': scene_info.output_path, 'time': round(time.time() - tic, 1), 'error': error}
 
 if __name__ == '__main__':
     run('serial', {'tasks': ['Cyz_TJST_1.json', 'Cyz_TJST_2.json']})
\ No newline at end of file
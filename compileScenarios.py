@@ -0,0 +1,37 @@
+import time
+import argparse
+
+from OnSiteReplay.ReplayParser import ReplayParser
+from utils.ScenarioManager import select_scenario_manager
+from utils.ScenarioManager.ScenarioBundle import ScenarioBundle
+
+def main():
+    # 将REPLAY、FRAGMENT赛道的场景文件夹编译为二进制场景包，之后加载场景时直接读取场景包
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mode', nargs='+', default=['REPLAY', 'FRAGMENT'], choices=['REPLAY', 'FRAGMENT'], help='需要编译的赛道')
+    parser.add_argument('--tasks', nargs='*', default=None, help='需要编译的场景名称，默认编译全部场景')
+    parser.add_argument('--task-dir', default=None, help='场景文件夹所在目录，默认为scenario/<赛道>')
+    parser.add_argument('--force', action='store_true', help='重新编译未过期的场景包')
+    args = parser.parse_args()
+
+    for mode in args.mode:
+        scenario_manager = select_scenario_manager(mode, {'tasks': args.tasks, 'skipExist': False}, args.task_dir)
+        compiled, skipped, failed = 0, 0, 0
+        tic = time.time()
+        while scenario_manager.next():
+            scene_info = scenario_manager.cur_scene
+            prefix = f"[{mode:8s}-{scene_info.num+1:03d}/{scenario_manager.tot_scene_num:03d}] <{scene_info.name}>"
+            if not args.force and ScenarioBundle.open(scene_info.source_file) is not None:
+                skipped += 1
+                continue
+            try:
+                path = ReplayParser().compile(scene_info)
+                compiled += 1
+                print(f"{prefix} Compiled to {path}.")
+            except Exception as e:
+                failed += 1
+                print(f"{prefix} Compile failed with error: {repr(e)}.")
+        print(f"[{mode:8s}] {compiled} compiled, {skipped} up to date, {failed} failed in {round(time.time() - tic, 1)}s.")
+
+if __name__ == '__main__':
+    main()
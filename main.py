@@ -1,17 +1,69 @@
 import os
 import yaml
 import time
+import argparse
+from functools import partial
+from collections import Counter
 
 import TessNG
 import OnSiteReplay
 
 from utils.ScenarioManager import select_scenario_manager
 from utils.logger import logger
+from utils.opendrive2discretenet import BORDER_MEMO_SIZE
 from planner import PLANNER
 
+def run_replay_batch(config: dict, scenario_manager, workers: int) -> None:
+    """多进程并行运行回放测试，并在全部任务结束后汇总测试结果"""
+    scene_infos = []
+    while scenario_manager.next():
+        scene_infos.append(scenario_manager.cur_scene)
+    tot = len(scenario_manager.tasks)
+    tic = time.time()
+    results = []
+    for result in OnSiteReplay.run_batch(config, PLANNER, scene_infos, workers):
+        results.append(result)
+        prefix = f"[{'REPLAY':8s}-{result['num']+1:03d}/{tot:03d}] <{result['name']}>"
+        if result['error']:
+            logger.critical(f"{prefix} Test Collapse with error: {result['error']}.")
+        elif os.path.exists(result['output_path']):
+            logger.info(f"{prefix} Test finished in {result['time']}s with end code {result['end']}.")
+        else:
+            logger.error(f"{prefix} Cannot locate correct output file!")
+    toc = time.time()
+    end_codes = Counter(str(result['end']) if not result['error'] else 'error' for result in results)
+    logger.info(f"[{'REPLAY':8s}] {len(results)} tests finished in {round(toc - tic, 1)}s with {workers} workers "
+                f"(sum of test time {round(sum(result['time'] for result in results), 1)}s), end codes: {dict(end_codes)}.")
+
+def run_tessng_batch(mode: str, config: dict, scenario_manager, workers: int) -> None:
+    """同时运行多个TessNG实例进行FRAGMENT/SERIAL测试，并在全部任务结束后汇总测试结果"""
+    def scene_infos():
+        while scenario_manager.next():
+            yield scenario_manager.cur_scene
+    tot = len(scenario_manager.tasks)
+    tic = time.time()
+    results = []
+    for result in TessNG.run_batch(mode, config, PLANNER, scene_infos(), workers):
+        results.append(result)
+        prefix = f"[{mode:8s}-{result['num']+1:03d}/{tot:03d}] <{result['name']}>"
+        if result['error']:
+            logger.critical(f"{prefix} Test Collapse with error: {result['error']}.")
+        elif os.path.exists(result['output_path']):
+            logger.info(f"{prefix} Test finished in {result['time']}s.")
+        else:
+            logger.error(f"{prefix} Cannot locate correct output file!")
+    toc = time.time()
+    failed = sum(1 for result in results if result['error'] or not os.path.exists(result['output_path']))
+    logger.info(f"[{mode:8s}] {len(results)} tests finished in {round(toc - tic, 1)}s with {workers} TessNG instances "
+                f"(sum of test time {round(sum(result['time'] for result in results), 1)}s), {failed} failed.")
+
 def main():
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=1, help='并行测试数，大于1时REPLAY任务以多进程批量运行，FRAGMENT/SERIAL任务同时运行多个TessNG实例')
+    args = parser.parse_args()
+
     with open('./config/tasks.yaml', 'r') as f:
         tasks = yaml.safe_load(f)
     for mode, config in tasks.items():
@@ -19,11 +71,20 @@ def main():
             if not os.path.exists(os.path.join(BASE_DIR, 'TessNG', 'WorkSpace', 'Cert', '_cert')):
                 TessNG.run(mode, {})
         scenario_manager = select_scenario_manager(mode, config)
+        if mode == 'REPLAY' and args.workers > 1:
+            run_replay_batch(config, scenario_manager, args.workers)
+            continue
+        if mode in ('FRAGMENT', 'SERIAL') and args.workers > 1:
+            run_tessng_batch(mode, config, scenario_manager, args.workers)
+            continue
+        if mode == 'REPLAY':
+            # 开启预取时后台线程同时解析后续场景的轨迹与路网
+            scenario_manager.prepare = partial(OnSiteReplay.prepare, memo_size=config.get('borderMemoSize', BORDER_MEMO_SIZE))
         while scenario_manager.next():
             try:
                 tic = time.time()
                 if mode == 'REPLAY':
-                    OnSiteReplay.run(config, PLANNER(), scene_info=scenario_manager.cur_scene)
+                    OnSiteReplay.run(config, PLANNER(), scene_info=scenario_manager.cur_scene, replay_info=scenario_manager.cur_prepared)
                 else:
                     TessNG.run(mode, config, PLANNER(), scene_info=scenario_manager.cur_scene)
                 toc = time.time()
@@ -36,4 +97,4 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
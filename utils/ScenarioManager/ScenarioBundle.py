@@ -0,0 +1,152 @@
+import os
+import json
+import mmap
+import struct
+import hashlib
+import numpy as np
+
+from utils.opendrive2discretenet.cache import CACHE_VERSION
+
+# 场景包格式版本，存储格式或编译内容变化时需递增，使旧场景包失效
+BUNDLE_VERSION = 1
+BUNDLE_SUFFIX = '.bundle'
+MAGIC = b'OSBUNDLE'
+# 各数组在文件中的起始位置按该字节数对齐
+ALIGNMENT = 64
+# 参与过期判断的场景文件
+SOURCE_KEYS = ('xodr', 'xosc', 'json')
+
+
+def _fingerprint(path: str, with_hash: bool = True) -> dict:
+    stat = os.stat(path)
+    result = {'name': os.path.basename(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if with_hash:
+        sha1 = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha1.update(chunk)
+        result['sha1'] = sha1.hexdigest()
+    return result
+
+
+def _to_json(value):
+    """numpy标量转换为Python内置类型"""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class ScenarioBundle():
+    """
+    单个场景编译后的二进制场景包，存放于场景文件夹内，文件名为<场景文件夹名>.bundle
+        文件结构：MAGIC(8字节) + 头部长度(8字节，小端) + JSON头部 + 按ALIGNMENT对齐的各数组原始数据
+        - 头部记录格式版本、各场景文件的大小/修改时间/SHA-1、各数组的dtype/shape/偏移量，以及可JSON序列化的场景信息meta
+        - 数组以内存映射方式只读访问，读取时不复制数据
+        - 场景文件的大小与修改时间均未变化时视为未过期，否则比较文件内容的SHA-1，场景文件增删或内容变化时场景包失效
+    """
+    def __init__(self, path: str, header: dict, data_offset: int):
+        self.path = path
+        self.header = header
+        self.meta = header['meta']
+        self._data_offset = data_offset
+        self._buffer = None
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.header['arrays']
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        """以内存映射方式读取数组，返回只读视图"""
+        dtype, shape, offset = self.header['arrays'][name]
+        count = int(np.prod(shape, dtype=np.int64))
+        if count == 0:
+            return np.zeros(shape, dtype=dtype)
+        if self._buffer is None:
+            with open(self.path, 'rb') as f:
+                self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return np.frombuffer(self._buffer, dtype=dtype, count=count, offset=self._data_offset + offset).reshape(shape)
+
+    @staticmethod
+    def path_for(source_file: dict) -> str:
+        """场景包路径，与OpenScenario文件位于同一场景文件夹"""
+        scene_dir = os.path.dirname(source_file['xosc'] or source_file['xodr'])
+        return os.path.join(scene_dir, os.path.basename(scene_dir) + BUNDLE_SUFFIX)
+
+    @classmethod
+    def open(cls, source_file: dict) -> 'ScenarioBundle':
+        """读取场景包头部，场景包不存在、已损坏或相对于场景文件已过期时返回None"""
+        if not (source_file.get('xosc') or source_file.get('xodr')):
+            return None
+        path = cls.path_for(source_file)
+        try:
+            with open(path, 'rb') as f:
+                prefix = f.read(len(MAGIC) + 8)
+                if len(prefix) < len(MAGIC) + 8 or prefix[:len(MAGIC)] != MAGIC:
+                    return None
+                header_size, = struct.unpack('<Q', prefix[len(MAGIC):])
+                header = json.loads(f.read(header_size).decode('utf-8'))
+        except (OSError, ValueError):
+            return None
+        bundle = cls(path, header, cls._align(len(MAGIC) + 8 + header_size))
+        return bundle if bundle.is_fresh(source_file) else None
+
+    def is_fresh(self, source_file: dict) -> bool:
+        if self.header.get('version') != [BUNDLE_VERSION, CACHE_VERSION]:
+            return False
+        sources = self.header['sources']
+        current = {key: source_file[key] for key in SOURCE_KEYS if source_file.get(key)}
+        if set(current) != set(sources):
+            return False
+        for key, path in current.items():
+            try:
+                stat = _fingerprint(path, with_hash=False)
+                if stat['name'] != sources[key]['name']:
+                    return False
+                if stat['size'] == sources[key]['size'] and stat['mtime_ns'] == sources[key]['mtime_ns']:
+                    continue
+                # 修改时间变化（如复制场景文件夹）但内容未变时仍可使用
+                if _fingerprint(path)['sha1'] != sources[key]['sha1']:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    @classmethod
+    def write(cls, source_file: dict, meta: dict, arrays: dict) -> str:
+        """
+        写入场景包，先写入临时文件再重命名，避免并行进程读到不完整的文件
+        Args:
+            source_file (dict): ScenarioInfo.source_file，用于确定场景包路径及记录场景文件指纹
+            meta (dict): 可JSON序列化的场景信息
+            arrays (dict): 数组名 -> np.ndarray，不支持object类型
+        Returns:
+            str: 场景包路径
+        """
+        layout, offset = {}, 0
+        arrays = {name: np.asarray(value, order='C') for name, value in arrays.items()}
+        for name, value in arrays.items():
+            if value.dtype.hasobject:
+                raise TypeError(f"Array {name} with object dtype cannot be stored in scenario bundle")
+            layout[name] = [value.dtype.str, list(value.shape), offset]
+            offset = cls._align(offset + value.nbytes)
+        header = json.dumps({
+            'version': [BUNDLE_VERSION, CACHE_VERSION],
+            'sources': {key: _fingerprint(source_file[key]) for key in SOURCE_KEYS if source_file.get(key)},
+            'arrays': layout,
+            'meta': meta,
+        }, default=_to_json).encode('utf-8')
+
+        path = cls.path_for(source_file)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        data_offset = cls._align(len(MAGIC) + 8 + len(header))
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC + struct.pack('<Q', len(header)) + header)
+            for name, value in arrays.items():
+                f.seek(data_offset + layout[name][2])
+                f.write(value.tobytes())
+            f.truncate(data_offset + offset)
+        os.replace(tmp_path, path)
+        return path
+
+    @staticmethod
+    def _align(offset: int) -> int:
+        return -(-offset // ALIGNMENT) * ALIGNMENT
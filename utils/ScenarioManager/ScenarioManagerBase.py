@@ -1,9 +1,16 @@
 import os
+from collections import deque
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
 from .ScenarioInfo import ScenarioInfo
+from .ScenarioManifest import ScenarioManifest
 
 class ScenarioManagerBase():
     def __init__(self, config: dict):
         self.skip_exist = config.get('skipExist', False)
+        self.use_manifest = config.get('useManifest', True)
+        self.output_format = config.get('outputFormat', 'csv')
         self.record = {}
 
         self.scenario_type = ""
@@ -14,33 +21,113 @@ class ScenarioManagerBase():
         if not os.path.exists(self.output_path):
             os.makedirs(self.output_path)
         self.tot_scene_num = 0
+        self.task_dir = ""
+        self._manifest = None
+
+        # 后台预先准备的场景数量，0表示不预取
+        self.prefetch = config.get('prefetch', 0)
+        # prepare的运行方式，thread为后台线程；process为独立进程（不受GIL限制，prepare需为可pickle的模块级函数），
+        # 仅在显式指定时创建进程池，每个子进程启动时需重新导入主模块，只适用于prepare耗时远大于该启动开销的场景
+        self.prefetch_mode = config.get('prefetchMode', 'thread')
+        # 可选的场景准备函数prepare(scene_info)，结果为cur_prepared（如回放测试的ReplayInfo）
+        self.prepare = None
+        self.cur_prepared = None
+        self._executor = None
+        self._prepare_executor = None
+        self._prefetching = deque()
+        self._prefetch_num = 0
+
+    @property
+    def manifest(self) -> ScenarioManifest:
+        """场景目录清单，首次使用时以task_dir加载"""
+        if self._manifest is None:
+            self._manifest = ScenarioManifest(self.task_dir, enabled=self.use_manifest)
+        return self._manifest
  
     def next(self) -> bool:
-        self.cur_scene_num += 1
-        if self.cur_scene_num >= self.tot_scene_num:
-            return False
-        if self.skip_exist and self._is_exist(self.tasks[self.cur_scene_num]):
-            return self.next()
-        try:
-            self.cur_scene = self._struct_scene_info()
-            return True
-        except Exception as e:
-            print(repr(e))
-            self.record[self.tasks[self.cur_scene_num]] = repr(e)
-            return self.next()
-        
-    def _struct_scene_info(self) -> ScenarioInfo:
-        pass
+        """
+        切换到下一个测试场景，无剩余场景时返回False
+        prefetch大于0时，后续prefetch个场景的ScenarioInfo在后台线程中提前构建，prepare按prefetchMode在后台进程或线程中提前调用，与当前场景的测试同时进行
+        """
+        if self.prefetch > 0:
+            return self._next_prefetched()
+        while True:
+            self.cur_scene_num += 1
+            if self.cur_scene_num >= self.tot_scene_num:
+                self.manifest.save()
+                return False
+            if self.skip_exist and self._is_exist(self.tasks[self.cur_scene_num]):
+                continue
+            try:
+                self.cur_scene = self._struct_scene_info(self.cur_scene_num)
+                self.cur_prepared = None
+                return True
+            except Exception as e:
+                print(repr(e))
+                self.record[self.tasks[self.cur_scene_num]] = repr(e)
 
-    def _is_exist(self, scenario_name: str) -> bool:
-        for file in os.listdir(self.output_path):
-            if self.scenario_type in file and f"_{scenario_name}_" in file:
+    def _next_prefetched(self) -> bool:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.prefetch, thread_name_prefix='prefetch')
+            if self.prepare is not None and self.prefetch_mode == 'process':
+                # 主进程中已有后台线程，子进程以spawn方式启动，避免fork时复制线程持有的锁
+                self._prepare_executor = ProcessPoolExecutor(max_workers=self.prefetch, mp_context=multiprocessing.get_context('spawn'))
+        self._fill_prefetch()
+        while self._prefetching:
+            num, future = self._prefetching.popleft()
+            self._fill_prefetch()
+            try:
+                self.cur_scene, self.cur_prepared = future.result()
+                self.cur_scene_num = num
                 return True
+            except Exception as e:
+                print(repr(e))
+                self.record[self.tasks[num]] = repr(e)
+        self.cur_scene_num = self.tot_scene_num
+        self._executor.shutdown()
+        self._executor = None
+        if self._prepare_executor is not None:
+            self._prepare_executor.shutdown()
+            self._prepare_executor = None
+        self.manifest.save()
         return False
 
+    def _fill_prefetch(self) -> None:
+        """提交后续场景的准备任务，使后台同时准备的场景数保持为prefetch"""
+        while len(self._prefetching) < self.prefetch and self._prefetch_num < self.tot_scene_num:
+            num = self._prefetch_num
+            self._prefetch_num += 1
+            if self.skip_exist and self._is_exist(self.tasks[num]):
+                continue
+            self._prefetching.append((num, self._executor.submit(self._prepare_scene, num)))
+
+    def _prepare_scene(self, num: int) -> tuple:
+        """在后台线程中构建ScenarioInfo并调用prepare，prepare出错时返回None，由测试流程重新解析并报告错误"""
+        scene_info = self._struct_scene_info(num)
+        prepared = None
+        if self.prepare is not None:
+            try:
+                if self._prepare_executor is not None:
+                    prepared = self._prepare_executor.submit(self.prepare, scene_info).result()
+                else:
+                    prepared = self.prepare(scene_info)
+            except Exception:
+                prepared = None
+        return scene_info, prepared
+
+    def _struct_scene_info(self, num: int) -> ScenarioInfo:
+        pass
+
+    def _list_scene_dirs(self) -> list:
+        """task_dir中的全部场景文件夹"""
+        return [
+            scene_name for scene_name, is_dir in self.manifest.listdir(self.task_dir).items()
+            if is_dir and not scene_name.startswith('.') and scene_name != '__pycache__'
+        ]
+
+    def _is_exist(self, scenario_name: str) -> bool:
+        return scenario_name in self.manifest.completed(self.output_path, self.scenario_type)
+
     def _find_file_with_suffix(self, dir: str, suffix: str) -> str:
-        for f in os.listdir(dir):
-            if not f.startswith('.') and f.endswith(suffix):
-                return os.path.join(dir, f)
         # print(f"[LOAD TASK ERROR]: Cannot find file with suffix \"{suffix}\" in {dir}!")
-        return ""
\ No newline at end of file
+        return self.manifest.find_file(dir, suffix)
\ No newline at end of file
@@ -6,6 +6,7 @@ import re
 import xml.dom.minidom
 
 from .ScenarioInfo import ScenarioInfo
+from .ScenarioBundle import ScenarioBundle
 from .ScenarioManagerBase import ScenarioManagerBase
 
 class ScenarioManagerForFragment(ScenarioManagerBase):
@@ -30,7 +31,7 @@ class ScenarioManagerForFragment(ScenarioManagerBase):
         if tasks:
             for scene_name in tasks:
                 scene_path = os.path.join(self.task_dir, scene_name)
-                if os.path.exists(scene_path):
+                if self.manifest.listdir(self.task_dir).get(scene_name):
                     if self._check_file_integrity(scene_path):
                         self.tasks.append(scene_name)
                     else:
@@ -39,15 +40,15 @@ class ScenarioManagerForFragment(ScenarioManagerBase):
                 else:
                     print(f"[LOAD SENARIO ERROR]: Cannot find task {scene_name}, please check the task name and retry!")
         else:
-            for scene_name in os.listdir(self.task_dir):
+            for scene_name in self._list_scene_dirs():
                 scene_path = os.path.join(self.task_dir, scene_name)
-                if not scene_name.startswith('.') and scene_name != '__pycache__' and os.path.isdir(scene_path):
-                    if self._check_file_integrity(scene_path):
-                        self.tasks.append(scene_name)
-                    else:
-                        self.tasks_without_tess.append(scene_name)
-                        print(f"[LOAD SENARIO ERROR]: Check file integrity in {scene_name}, cannot find all necessary files!")
+                if self._check_file_integrity(scene_path):
+                    self.tasks.append(scene_name)
+                else:
+                    self.tasks_without_tess.append(scene_name)
+                    print(f"[LOAD SENARIO ERROR]: Check file integrity in {scene_name}, cannot find all necessary files!")
         self.tot_scene_num = len(self.tasks)
+        self.manifest.save()
 
     def _check_file_integrity(self, scene_path):
         if not self._find_file_with_suffix(scene_path, '.xodr'):
@@ -58,27 +59,36 @@ class ScenarioManagerForFragment(ScenarioManagerBase):
             return False
         return True
 
-    def _struct_scene_info(self):
-        scene_dir = os.path.join(self.task_dir, self.tasks[self.cur_scene_num])
-        goal, vehicles, dt = self._parse_openscenario(self._find_file_with_suffix(scene_dir, '.xosc'))
-        output_name = f"{self.scenario_type}_{self.cur_scene_num}_{self.tasks[self.cur_scene_num]}_result.csv"
-        return ScenarioInfo(
-            num = self.cur_scene_num,
-            name = self.tasks[self.cur_scene_num],
-            type = self.scenario_type,
-            source_file = {
-                "xodr": self._find_file_with_suffix(scene_dir, '.xodr'), 
-                "xosc": self._find_file_with_suffix(scene_dir, '.xosc'),
-                "json": "", 
-                "tess": self._find_file_with_suffix(scene_dir, '.tess')
-                },
-            output_path = os.path.join(self.output_path, output_name),
+    def _struct_scene_info(self, num: int):
+        scene_dir = os.path.join(self.task_dir, self.tasks[num])
+        source_file = {
+            "xodr": self._find_file_with_suffix(scene_dir, '.xodr'), 
+            "xosc": self._find_file_with_suffix(scene_dir, '.xosc'),
+            "json": "", 
+            "tess": self._find_file_with_suffix(scene_dir, '.tess')
+            }
+        # 存在未过期的场景包时直接读取其中的场景信息，无需解析OpenScenario文件
+        bundle = ScenarioBundle.open(source_file)
+        if bundle is not None:
+            task_info = bundle.meta['task_info']
+            # JSON中的键均为字符串，还原为车辆序号
+            vehicles = {int(num): vehicle for num, vehicle in bundle.meta['additional_info']['vehicle_init_status'].items()}
+        else:
+            goal, vehicles, dt = self._parse_openscenario(source_file['xosc'])
             task_info = {
                 "startPos": [vehicles[0]['x'], vehicles[0]['y']], 
                 "targetPos": goal, 
                 "waypoints": [], 
                 "dt": dt,
-            },
+            }
+        output_name = f"{self.scenario_type}_{num}_{self.tasks[num]}_result.{self.output_format}"
+        return ScenarioInfo(
+            num = num,
+            name = self.tasks[num],
+            type = self.scenario_type,
+            source_file = source_file,
+            output_path = os.path.join(self.output_path, output_name),
+            task_info = task_info,
             additional_info = {
                 'vehicle_init_status': vehicles,
             }
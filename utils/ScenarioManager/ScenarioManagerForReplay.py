@@ -3,6 +3,7 @@ import re
 import xml.dom.minidom
 
 from .ScenarioInfo import ScenarioInfo
+from .ScenarioBundle import ScenarioBundle
 from .ScenarioManagerBase import ScenarioManagerBase
 
 class ScenarioManagerForReplay(ScenarioManagerBase):
@@ -14,31 +15,33 @@ class ScenarioManagerForReplay(ScenarioManagerBase):
         tasks = config.get('tasks', [])
         if tasks:
             for scene_name in tasks:
-                if os.path.exists(os.path.join(self.task_dir, scene_name)):
+                if self.manifest.listdir(self.task_dir).get(scene_name):
                     self.tasks.append(scene_name)
                 else:
                     print(f"[LOAD SENARIO ERROR]: Cannot find task {scene_name}, please check the task name and retry!")
         else:
-            for scene_name in os.listdir(self.task_dir):
-                if not scene_name.startswith('.') and scene_name != '__pycache__' and os.path.isdir(os.path.join(self.task_dir, scene_name)):
-                    self.tasks.append(scene_name)
+            self.tasks += self._list_scene_dirs()
         self.tot_scene_num = len(self.tasks)
+        self.manifest.save()
 
-    def _struct_scene_info(self):
-        scene_dir = os.path.join(self.task_dir, self.tasks[self.cur_scene_num])
-        output_name = f"{self.scenario_type}_{self.cur_scene_num}_{self.tasks[self.cur_scene_num]}_result.csv"
+    def _struct_scene_info(self, num: int):
+        scene_dir = os.path.join(self.task_dir, self.tasks[num])
+        output_name = f"{self.scenario_type}_{num}_{self.tasks[num]}_result.{self.output_format}"
+        source_file = {
+            "xodr": self._find_file_with_suffix(scene_dir, '.xodr'), 
+            "xosc": self._find_file_with_suffix(scene_dir, '.xosc'), 
+            "json": self._find_file_with_suffix(scene_dir, '.json'), 
+            "tess": "",
+            }
+        # 存在未过期的场景包时直接读取其中的task_info，无需解析OpenScenario文件
+        bundle = ScenarioBundle.open(source_file)
         return ScenarioInfo(
-            num = self.cur_scene_num,
-            name = self.tasks[self.cur_scene_num],
+            num = num,
+            name = self.tasks[num],
             type = self.scenario_type,
-            source_file = {
-                "xodr": self._find_file_with_suffix(scene_dir, '.xodr'), 
-                "xosc": self._find_file_with_suffix(scene_dir, '.xosc'), 
-                "json": self._find_file_with_suffix(scene_dir, '.json'), 
-                "tess": "",
-                },
+            source_file = source_file,
             output_path = os.path.join(self.output_path, output_name),
-            task_info = self._parse_openscenario(self._find_file_with_suffix(scene_dir, '.xosc'))
+            task_info = bundle.meta['task_info'] if bundle is not None else self._parse_openscenario(source_file['xosc'])
         )
     
     def _parse_openscenario(self, file_dir: str):
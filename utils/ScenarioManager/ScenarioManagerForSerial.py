@@ -17,26 +17,27 @@ class ScenarioManagerForSerial(ScenarioManagerBase):
 
         if tasks:
             for task in tasks:
-                if os.path.exists(os.path.join(self.task_dir, f"{task}.json")):
+                if f"{task}.json" in self.manifest.listdir(self.task_dir):
                     self.tasks.append(task)
                 else:
                     print(f"[LOAD SCENARIO ERROR]: Cannot find task {task}, please check the task name and retry!")
         else:
-            for task_name in os.listdir(self.task_dir):
+            for task_name in self.manifest.listdir(self.task_dir):
                 if not task_name.startswith('.') and task_name.endswith('.json'):
                     self.tasks.append(task_name.split('.json')[0])
         self.tot_scene_num = len(self.tasks)
+        self.manifest.save()
   
-    def _struct_scene_info(self):
-        with open(os.path.join(self.task_dir, f"{self.tasks[self.cur_scene_num]}.json"),'r', encoding='utf-8') as f:
+    def _struct_scene_info(self, num: int):
+        with open(os.path.join(self.task_dir, f"{self.tasks[num]}.json"),'r', encoding='utf-8') as f:
             scene_json = json.load(f)
         map_path = os.path.join(self.map_dir, scene_json['map'])
         assert os.path.exists(map_path), f"Cannot find map folder {map_path}, please download the map first!"
-        output_name = f"{self.scenario_type}_{self.cur_scene_num}_{self.tasks[self.cur_scene_num]}_result.csv"
+        output_name = f"{self.scenario_type}_{num}_{self.tasks[num]}_result.{self.output_format}"
         
         return ScenarioInfo(
-            num = self.cur_scene_num,
-            name = self.tasks[self.cur_scene_num].split('.json')[0],
+            num = num,
+            name = self.tasks[num].split('.json')[0],
             type = self.scenario_type,
             source_file = {
                 "xodr": self._find_file_with_suffix(map_path, '.xodr'), 
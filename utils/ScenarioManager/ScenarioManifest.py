@@ -0,0 +1,93 @@
+import os
+import re
+import json
+import time
+import hashlib
+
+# 清单格式版本，存储格式变化时需递增，使旧清单失效
+MANIFEST_VERSION = 1
+ROOT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+# 目录修改时间距列出目录时不足该时长（ns）时不予信任，下次加载时重新列出，避免同一时间精度内的修改被遗漏
+RACY_NS = 2 * 10 ** 9
+# 测试结果文件名：<赛道>_<序号>_<场景名>_result.<格式>
+OUTPUT_PATTERN = re.compile(r'^([A-Z]+)_\d+_(.+)_result\.[^.]+$')
+
+
+class ScenarioManifest():
+    """
+    场景目录清单，持久化保存场景目录、各场景文件夹及测试结果目录的文件列表
+        - 每个目录以其修改时间（st_mtime_ns）判断是否变化，未变化时直接使用清单中的文件列表，变化时才重新列出目录
+        - 同一目录在一次加载中至多检查一次，之后的查询均在内存中完成
+        - completed: 由测试结果目录的文件列表得到各赛道已完成的场景，取管理器初始化时的快照
+    清单保存在cache/scenario_manifest中，以场景目录的绝对路径区分，可随时删除
+    """
+    def __init__(self, task_dir: str, cache_dir: str = os.path.join(ROOT_PATH, 'cache', 'scenario_manifest'), enabled: bool = True):
+        self.enabled = enabled
+        self.path = os.path.join(cache_dir, f"{hashlib.sha1(os.path.abspath(task_dir).encode('utf-8')).hexdigest()}.json")
+        self._dirs = self._load() if enabled else {}
+        self._checked = {}
+        self._completed = None
+        self._dirty = False
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return data.get('dirs', {}) if data.get('version') == MANIFEST_VERSION else {}
+
+    def save(self) -> None:
+        """清单有更新时写入磁盘，先写入临时文件再重命名"""
+        if not (self.enabled and self._dirty):
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'dirs': self._dirs}, f)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def listdir(self, dir: str) -> dict:
+        """
+        目录中的文件及文件夹，保持os.listdir的顺序
+        Returns:
+            dict: 名称 -> 是否为文件夹，目录不存在时为空
+        """
+        dir = os.path.abspath(dir)
+        if dir in self._checked:
+            return self._checked[dir]
+        try:
+            mtime_ns = os.stat(dir).st_mtime_ns
+        except OSError:
+            self._checked[dir] = {}
+            return self._checked[dir]
+        record = self._dirs.get(dir)
+        if record is None or record['mtime_ns'] != mtime_ns:
+            with os.scandir(dir) as it:
+                entries = [[entry.name, entry.is_dir()] for entry in it]
+            # 目录刚被修改时，其修改时间可能在同一时间精度内再次变化
+            trusted = time.time_ns() - mtime_ns > RACY_NS
+            record = {'mtime_ns': mtime_ns if trusted else -1, 'entries': entries}
+            if self.enabled:
+                self._dirs[dir] = record
+                self._dirty = True
+        self._checked[dir] = dict(record['entries'])
+        return self._checked[dir]
+
+    def find_file(self, dir: str, suffix: str) -> str:
+        """目录中第一个以suffix结尾的非隐藏文件，不存在时返回空字符串"""
+        for name in self.listdir(dir):
+            if not name.startswith('.') and name.endswith(suffix):
+                return os.path.join(dir, name)
+        return ""
+
+    def completed(self, output_dir: str, scenario_type: str) -> set:
+        """测试结果目录中scenario_type赛道已有测试结果的场景名称"""
+        if self._completed is None:
+            self._completed = {}
+            for name in self.listdir(output_dir):
+                match = OUTPUT_PATTERN.match(name)
+                if match:
+                    self._completed.setdefault(match.group(1), set()).add(match.group(2))
+        return self._completed.get(scenario_type, set())
@@ -0,0 +1,197 @@
+import numpy as np
+
+# 矩形包围盒各列的含义，与cv2.RotatedRect的((cx, cy), (length, width), angle)一一对应
+BOX_FIELDS = ('x', 'y', 'length', 'width', 'yaw')
+
+
+def to_boxes(states, fields) -> np.ndarray:
+    """从按fields排列的状态数组中取出(N, 5)的矩形包围盒数组"""
+    states = np.asarray(states, dtype=float).reshape(-1, len(fields))
+    return states[:, [fields.index(key) for key in BOX_FIELDS]]
+
+
+def _box_axes(boxes: np.ndarray):
+    """返回各矩形纵向与横向的单位向量及半长、半宽"""
+    cos, sin = np.cos(boxes[:, 4]), np.sin(boxes[:, 4])
+    axis_l = np.stack([cos, sin], axis=1)
+    axis_w = np.stack([-sin, cos], axis=1)
+    return axis_l, axis_w, boxes[:, 2] / 2, boxes[:, 3] / 2
+
+
+def _dot(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return a[:, 0] * b[:, 0] + a[:, 1] * b[:, 1]
+
+
+def _pair_collision(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """逐行判断两组(M, 5)矩形是否相交"""
+    a_l, a_w, a_hl, a_hw = _box_axes(boxes_a)
+    b_l, b_w, b_hl, b_hw = _box_axes(boxes_b)
+    center = boxes_b[:, :2] - boxes_a[:, :2]
+
+    mask = np.ones(len(boxes_a), dtype=bool)
+    # 依次以两个矩形的边方向作为分离轴，任一轴上投影不重叠即不相交
+    for axis in (a_l, a_w, b_l, b_w):
+        distance = np.abs(_dot(center, axis))
+        a_radius = a_hl * np.abs(_dot(a_l, axis)) + a_hw * np.abs(_dot(a_w, axis))
+        b_radius = b_hl * np.abs(_dot(b_l, axis)) + b_hw * np.abs(_dot(b_w, axis))
+        mask &= distance <= a_radius + b_radius
+    return mask
+
+
+def box_collision(ego_box, boxes):
+    """基于分离轴定理判断主车矩形与N个矩形是否相交
+    Args:
+        ego_box: (5,) 主车矩形，列顺序见BOX_FIELDS
+        boxes: (N, 5) 背景要素矩形，列顺序见BOX_FIELDS
+    Returns:
+        mask (np.ndarray): (N,) 与主车相交的背景要素
+        first (int): 第一个与主车相交的背景要素序号，无碰撞时为-1
+
+    与原先逐对调用cv2.rotatedRectangleIntersection的结果一致：
+    原实现将y轴取反并将航向角取反后交给OpenCV，相当于对两个矩形同时做镜像变换，不改变相交关系，因此此处直接在原坐标系下计算
+    两矩形仅边界接触时同样视为相交
+    """
+    boxes = np.asarray(boxes, dtype=float).reshape(-1, len(BOX_FIELDS))
+    if not len(boxes):
+        return np.zeros(0, dtype=bool), -1
+    ego = np.asarray(ego_box, dtype=float).reshape(1, len(BOX_FIELDS))
+    mask = _pair_collision(np.broadcast_to(ego, boxes.shape), boxes)
+    hits = np.flatnonzero(mask)
+    return mask, int(hits[0]) if hits.size else -1
+
+
+def bounding_radius(boxes: np.ndarray) -> np.ndarray:
+    """矩形包围盒的外接圆半径"""
+    return np.hypot(boxes[:, 2], boxes[:, 3]) / 2
+
+
+class BroadPhase():
+    """
+    按x坐标排序的扫描裁剪（sweep and prune）索引，每帧以全部交通参与者的位置重建一次
+        - query_radius: 查询与给定点距离小于r的交通参与者
+        - query_candidates: 查询外接圆与给定矩形外接圆相交的交通参与者，作为碰撞检测的候选
+    查询只需二分定位x方向的窗口，再对窗口内的交通参与者进行精确筛选，开销只与附近交通参与者的数量有关
+    返回的序号均为构建时的原始序号，且按升序排列
+    """
+    def __init__(self, xy, radius=None):
+        """
+        Args:
+            xy: (N, 2) 各交通参与者的位置
+            radius (optional): (N,) 各交通参与者的外接圆半径，仅query_candidates使用. Defaults to None.
+        """
+        self.xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+        self.radius = np.zeros(len(self.xy)) if radius is None else np.asarray(radius, dtype=float)
+        self.max_radius = float(self.radius.max()) if len(self.radius) else 0.0
+        self.order = np.argsort(self.xy[:, 0], kind='stable')
+        self.sorted_x = self.xy[self.order, 0]
+
+    @classmethod
+    def from_boxes(cls, boxes) -> 'BroadPhase':
+        """以(N, 5)的矩形包围盒构建索引，列顺序见BOX_FIELDS"""
+        boxes = np.asarray(boxes, dtype=float).reshape(-1, len(BOX_FIELDS))
+        return cls(boxes[:, :2], bounding_radius(boxes))
+
+    def __len__(self):
+        return len(self.xy)
+
+    def _window(self, x: float, half_width: float) -> np.ndarray:
+        lo = np.searchsorted(self.sorted_x, x - half_width, side='left')
+        hi = np.searchsorted(self.sorted_x, x + half_width, side='right')
+        return self.order[lo:hi]
+
+    def query_radius(self, center, r: float) -> np.ndarray:
+        """与center距离小于r的交通参与者序号"""
+        cx, cy = float(center[0]), float(center[1])
+        window = self._window(cx, r)
+        xy = self.xy[window]
+        near = window[np.hypot(xy[:, 0] - cx, xy[:, 1] - cy) < r]
+        return np.sort(near)
+
+    def query_candidates(self, box) -> np.ndarray:
+        """外接圆与box外接圆相交的交通参与者序号，box列顺序见BOX_FIELDS"""
+        box = np.asarray(box, dtype=float).reshape(1, len(BOX_FIELDS))
+        ego_radius = float(bounding_radius(box)[0])
+        cx, cy = box[0, 0], box[0, 1]
+        window = self._window(cx, ego_radius + self.max_radius)
+        xy = self.xy[window]
+        near = window[np.hypot(xy[:, 0] - cx, xy[:, 1] - cy) <= ego_radius + self.radius[window]]
+        return np.sort(near)
+
+
+def first_collision(ego_box, boxes) -> int:
+    """先以BroadPhase筛选候选，再对候选进行分离轴检测，返回第一个与主车相交的背景要素序号，无碰撞时为-1"""
+    boxes = np.asarray(boxes, dtype=float).reshape(-1, len(BOX_FIELDS))
+    candidates = BroadPhase.from_boxes(boxes).query_candidates(ego_box)
+    if not candidates.size:
+        return -1
+    _, first = box_collision(ego_box, boxes[candidates])
+    return int(candidates[first]) if first != -1 else -1
+
+
+def swept_collision(ego_start, ego_end, boxes_start, boxes_end, tolerance: float = 0.05, max_substeps: int = 256):
+    """连续碰撞检测，主车与背景要素在[t, t+dt]内均按线性插值运动（航向角按最小转角插值），判断期间是否发生相交
+    Args:
+        ego_start, ego_end: (5,) 主车在区间起止时刻的矩形，列顺序见BOX_FIELDS
+        boxes_start, boxes_end: (N, 5) 背景要素在区间起止时刻的矩形，两者逐行对应
+        tolerance (float, optional): 相邻采样时刻间矩形的最大相对移动距离，单位：m，嵌入深度小于该值的擦碰可能被忽略. Defaults to 0.05.
+        max_substeps (int, optional): 区间内的最大采样段数. Defaults to 256.
+    Returns:
+        mask (np.ndarray): (N,) 区间内与主车相交的背景要素
+        first (int): 第一个与主车相交的背景要素序号，无碰撞时为-1
+
+    先以外接圆的相对运动轨迹与主车外接圆的最近距离筛选候选，再按相对位移与转角确定采样段数，
+    使相邻采样时刻间矩形的移动距离不超过tolerance，避免大步长下一帧之内穿过背景要素
+    区间端点同样参与检测，因此结果包含t+dt时刻的离散检测结果
+    """
+    ego_start = np.asarray(ego_start, dtype=float).reshape(len(BOX_FIELDS))
+    ego_end = np.asarray(ego_end, dtype=float).reshape(len(BOX_FIELDS))
+    boxes_start = np.asarray(boxes_start, dtype=float).reshape(-1, len(BOX_FIELDS))
+    boxes_end = np.asarray(boxes_end, dtype=float).reshape(-1, len(BOX_FIELDS))
+    mask = np.zeros(len(boxes_start), dtype=bool)
+    if not len(boxes_start):
+        return mask, -1
+
+    # 粗筛：相对运动为线性运动，求区间内两外接圆圆心的最近距离
+    ego_radius = max(bounding_radius(ego_start[None])[0], bounding_radius(ego_end[None])[0])
+    obj_radius = np.maximum(bounding_radius(boxes_start), bounding_radius(boxes_end))
+    rel_start = boxes_start[:, :2] - ego_start[:2]
+    rel_move = (boxes_end[:, :2] - boxes_start[:, :2]) - (ego_end[:2] - ego_start[:2])
+    move_sq = _dot(rel_move, rel_move)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        s = np.where(move_sq > 0, np.clip(-_dot(rel_start, rel_move) / move_sq, 0, 1), 0)
+    closest = rel_start + s[:, None] * rel_move
+    candidates = np.flatnonzero(np.hypot(closest[:, 0], closest[:, 1]) <= ego_radius + obj_radius)
+    if not candidates.size:
+        return mask, -1
+
+    start, end = boxes_start[candidates], boxes_end[candidates]
+    ego_turn = _angle_diff(ego_start[4], ego_end[4])
+    obj_turn = _angle_diff(start[:, 4], end[:, 4])
+    # 采样段数：相对平移与两者转动引起的角点位移之和不超过tolerance
+    travel = np.sqrt(move_sq[candidates]) + abs(ego_turn) * ego_radius + np.abs(obj_turn) * obj_radius[candidates]
+    substeps = int(np.clip(np.ceil(travel.max() / tolerance), 1, max_substeps))
+
+    # 所有采样时刻与候选背景要素一次性批量检测
+    s = np.linspace(0, 1, substeps + 1)[:, None]
+    num = len(candidates)
+    ego_boxes = _interpolate(ego_start[None], ego_end[None], ego_turn, s)
+    obj_boxes = _interpolate(start[None], end[None], obj_turn[None], s[:, :, None])
+    hit = _pair_collision(
+        np.repeat(ego_boxes, num, axis=0),
+        obj_boxes.reshape(-1, len(BOX_FIELDS)),
+    ).reshape(substeps + 1, num).any(axis=0)
+    mask[candidates[hit]] = True
+    hits = np.flatnonzero(mask)
+    return mask, int(hits[0]) if hits.size else -1
+
+
+def _angle_diff(start, end):
+    """由start转到end的最小转角"""
+    return (np.asarray(end) - np.asarray(start) + np.pi) % (2 * np.pi) - np.pi
+
+
+def _interpolate(start: np.ndarray, end: np.ndarray, turn, s) -> np.ndarray:
+    """按比例s对矩形进行线性插值，航向角按最小转角turn插值"""
+    boxes = start + s * (end - start)
+    boxes[..., 4] = start[..., 4] + s[..., 0] * turn
+    return boxes
@@ -1,4 +1,3 @@
-import cv2
 import numpy as np
 from numpy import array, linalg
 import os
@@ -8,6 +7,7 @@ from typing import Dict
 
 from utils.netStruct import outSide, crash
 from utils.logger import logger
+from utils.collision import BOX_FIELDS, box_collision, first_collision, swept_collision
 from utils.observation import EgoStatus, ObjectStatus, Observation
 
 def convertAngle(angle1: float):
@@ -32,23 +32,55 @@ def is_point_inside_rect(rect, egoPos) -> bool:
             return False
 
 def _is_collision(ego_info: dict, vehicle_info: dict) -> bool:
-    rect1 = ((ego_info['x'], -ego_info['y']), (ego_info['length'], ego_info['width']),
-             np.rad2deg(-ego_info['yaw']))
-    rect2 = ((vehicle_info['x'], -vehicle_info['y']), (vehicle_info['length'], vehicle_info['width']),
-             np.rad2deg(-vehicle_info['yaw']))
-    return cv2.rotatedRectangleIntersection(rect1, rect2)[0]
+    return bool(box_collision(
+        [ego_info[key] for key in BOX_FIELDS],
+        [[vehicle_info[key] for key in BOX_FIELDS]],
+    )[1] != -1)
 
 def detectCollision(ego_info: EgoStatus, object_info: Dict[str, ObjectStatus]) -> dict:
+    # 一次性收集全部背景要素的矩形包围盒，经外接圆粗筛后对候选批量进行相交检测
+    ids, boxes = [], []
     for obj_type in object_info.keys():
         for vehicle_id, vehicle_info in object_info[obj_type].items():
-            if _is_collision(vars(ego_info), vars(vehicle_info)):
-                return {
-                    'collideVehicle': dict(**vars(vehicle_info), id=vehicle_id),
-                    'ego': vars(ego_info),
-                }
-    return {}
-
-def testFinish(goal: list, observation: Observation, outOfTime: bool, outOfMap: bool) -> int:
+            ids.append((obj_type, vehicle_id))
+            boxes.append([getattr(vehicle_info, key) for key in BOX_FIELDS])
+    first = first_collision([getattr(ego_info, key) for key in BOX_FIELDS], boxes)
+    if first == -1:
+        return {}
+    obj_type, vehicle_id = ids[first]
+    return {
+        'collideVehicle': dict(**vars(object_info[obj_type][vehicle_id]), id=vehicle_id),
+        'ego': vars(ego_info),
+    }
+
+def detectSweptCollision(prev_observation: Observation, observation: Observation) -> dict:
+    """连续碰撞检测，判断主车与背景要素在上一帧与当前帧之间是否发生碰撞
+    上一帧不存在的背景要素视为静止于当前位置
+    """
+    ids, boxes_start, boxes_end = [], [], []
+    for obj_type in observation.object_info.keys():
+        prev_objects = prev_observation.object_info.get(obj_type, {})
+        for vehicle_id, vehicle_info in observation.object_info[obj_type].items():
+            box = [getattr(vehicle_info, key) for key in BOX_FIELDS]
+            prev_info = prev_objects.get(vehicle_id)
+            ids.append((obj_type, vehicle_id))
+            boxes_start.append(box if prev_info is None else [getattr(prev_info, key) for key in BOX_FIELDS])
+            boxes_end.append(box)
+    _, first = swept_collision(
+        [getattr(prev_observation.ego_info, key) for key in BOX_FIELDS],
+        [getattr(observation.ego_info, key) for key in BOX_FIELDS],
+        boxes_start,
+        boxes_end,
+    )
+    if first == -1:
+        return {}
+    obj_type, vehicle_id = ids[first]
+    return {
+        'collideVehicle': dict(**vars(observation.object_info[obj_type][vehicle_id]), id=vehicle_id),
+        'ego': vars(observation.ego_info),
+    }
+
+def testFinish(goal: list, observation: Observation, outOfTime: bool, outOfMap: bool, prev_observation: Observation = None) -> int:
     # 测试结束有两个条件，Ego行驶到对应的终点面域或者达到极限测试批次
     if outOfMap:
         logger.debug(f"(CODE-4): 测试车驶出道路边界")
@@ -60,6 +92,9 @@ def testFinish(goal: list, observation: Observation, outOfTime: bool, outOfMap:
         return 2
 
     collideInfo = detectCollision(observation.ego_info, observation.object_info)
+    # 传入上一帧观测时，额外检测两帧之间是否发生碰撞
+    if not collideInfo and prev_observation is not None:
+        collideInfo = detectSweptCollision(prev_observation, observation)
     if collideInfo:
         logger.debug(f"(CODE-3): 检测到测试车与背景车{collideInfo['collideVehicle']['id']}发生碰撞")
         # print(f"    --> 测试车状态 x:{collideInfo['ego']['x']} y:{collideInfo['ego']['y']} "
@@ -116,6 +151,63 @@ def updateEgoPos(action: list, dt: float, ego_info: EgoStatus) -> None:
         rot = rot,
     )
 
+def updateEgoPosBatch(action: np.ndarray, dt: np.ndarray, ego_state: np.ndarray) -> None:
+    """updateEgoPos的批量版本，对K个主车同时进行前向欧拉更新
+    Args:
+        action: np.ndarray, (K, 2) 修正后的加速度与前轮转角
+        dt: np.ndarray, (K,) 各主车的时间间隔
+        ego_state: np.ndarray, (K, 8) 主车状态, 列顺序为x, y, v, a, yaw, rot, length, width, 原地更新
+    """
+    acc, rot = action[:, 0], action[:, 1]
+    x, y, v, yaw, length = ego_state[:, 0], ego_state[:, 1], ego_state[:, 2], ego_state[:, 4], ego_state[:, 6]
+
+    new_state = np.stack([
+        x + v * np.cos(yaw) * dt,
+        y + v * np.sin(yaw) * dt,
+        np.maximum(0, v + acc * dt),
+        acc,
+        (yaw + v / length * 1.7 * np.tan(rot) * dt) % (2 * np.pi),
+        rot,
+    ], axis=1)
+    # 与ObjectStatus.update保持一致，保留三位小数
+    ego_state[:, :6] = np.round(new_state, 3)
+
+def check_action_batch(dt, prev_v, prev_action, new_action):
+    """check_action的批量版本，对K个主车的action同时进行动力学约束修正
+    Args:
+        dt: np.ndarray, (K,) 时间间隔
+        prev_v: np.ndarray, (K,) 上一帧的速度
+        prev_action: np.ndarray, (K, 2) 上一帧的action
+        new_action: np.ndarray, (K, 2) 选手返回的action
+    Returns:
+        np.ndarray, (K, 2) 满足动力学约束的action
+    """
+    ACC_LIMIT = 9.8         # m/s^2
+    JERK_LIMIT = 49.0       # m/s^3
+    ROT_LIMIT = 0.699       # rad
+    ROT_RATE_LIMIT = 1.397  # rad/s
+
+    new_action = np.asarray(new_action, dtype=float)
+    prev_action = np.asarray(prev_action, dtype=float)
+    checked_acc, checked_rot = new_action[:, 0].copy(), new_action[:, 1].copy()
+
+    with np.errstate(invalid='ignore'):
+        # 减速到停车的情况重新计算加速度，否则根据执行器动力学修正加速度
+        has_prev_acc = ~np.isnan(prev_action[:, 0])
+        stop = has_prev_acc & (prev_v + checked_acc * dt < 0)
+        jerk = (new_action[:, 0] - prev_action[:, 0]) / dt
+        over_jerk = has_prev_acc & ~stop & (np.abs(jerk) > JERK_LIMIT)
+        checked_acc = np.where(stop, -prev_v / dt, checked_acc)
+        checked_acc = np.where(over_jerk, prev_action[:, 0] + np.clip(jerk, -JERK_LIMIT, JERK_LIMIT) * dt, checked_acc)
+
+        # 根据执行器动力学修正前轮转角
+        has_prev_rot = ~np.isnan(prev_action[:, 1])
+        rot_rate = (new_action[:, 1] - prev_action[:, 1]) / dt
+        over_rot_rate = has_prev_rot & (np.abs(rot_rate) > ROT_RATE_LIMIT)
+        checked_rot = np.where(over_rot_rate, prev_action[:, 1] + np.clip(rot_rate, -ROT_RATE_LIMIT, ROT_RATE_LIMIT) * dt, checked_rot)
+
+    return np.stack([np.clip(checked_acc, -ACC_LIMIT, ACC_LIMIT), np.clip(checked_rot, -ROT_LIMIT, ROT_LIMIT)], axis=1)
+
 def check_action(dt, prev_v, prev_action, new_action):
     """检验选手返回的action是否满足动力学约束
     Args:
@@ -2,40 +2,77 @@ from typing import Dict, Union
 import math
 
 class ObjectStatus:
+    """交通参与者状态，以__slots__存储数值属性，不再为每个对象创建实例字典
+    vars(obj)/obj.__dict__仍可使用，返回由FIELDS组成的新字典
+    """
+    FIELDS = ('x', 'y', 'v', 'a', 'yaw', 'width', 'length')
+    __slots__ = FIELDS + ('_extern_obj',)
+
     def __init__(self, **kwargs):
-        self.x = 0
-        self.y = 0
-        self.v = 0
-        self.a = 0
-        self.yaw = 0
-        self.width = 0
-        self.length = 0
-        self.extern_obj = ExternObject()
+        for key in self.FIELDS:
+            setattr(self, key, 0)
+        # 仅在主车与外部车辆交互时才需要ExternObject，首次访问时再创建
+        self._extern_obj = None
 
         self.update(**kwargs)
     
     def __str__(self):
         return str(vars(self))
+
+    @property
+    def __dict__(self):
+        return {key: getattr(self, key) for key in self.FIELDS}
+
+    @property
+    def extern_obj(self):
+        if self._extern_obj is None:
+            self._extern_obj = ExternObject()
+        return self._extern_obj
+
+    def __getstate__(self):
+        return (self.__dict__, self._extern_obj)
+
+    def __setstate__(self, state):
+        fields, self._extern_obj = state
+        for key, value in fields.items():
+            setattr(self, key, value)
+
+    def __copy__(self):
+        return self.copy()
+
+    def __deepcopy__(self, memo):
+        return self.copy()
     
     def update(self, **kwargs):
+        fields = self.FIELDS
         for key, value in kwargs.items():
-            if hasattr(self, key):
+            if key in fields:
                 if key == 'yaw':
                     value = value % (2 * math.pi)
                 setattr(self, key, round(value, 3))
 
+    def set_values(self, fields: tuple, values: list) -> None:
+        """按fields顺序写入已完成取整的数值，供批量更新使用"""
+        for key, value in zip(fields, values):
+            setattr(self, key, value)
+
     def update_extern_object(self, externObjData):
         self.extern_obj.update(externObjData)
 
     def get_extern_object_info(self):
         return {key: vars(value) for key, value in self.extern_obj.externObjDict.items()}
 
+    def copy(self):
+        """返回状态快照，属性均为数值，逐个复制即可，无需copy.deepcopy的逐层递归"""
+        new = self.__class__.__new__(self.__class__)
+        for key in self.FIELDS:
+            setattr(new, key, getattr(self, key))
+        new._extern_obj = None if self._extern_obj is None else self._extern_obj.copy()
+        return new
+
 class EgoStatus(ObjectStatus):
-    def __init__(self, **kwargs):
-        self.a = 0
-        self.rot = 0
-        super().__init__()
-        self.update(**kwargs)
+    FIELDS = ('x', 'y', 'v', 'a', 'yaw', 'rot', 'width', 'length')
+    __slots__ = ('rot',)
 
 class Observation():
     def __init__(self):
@@ -65,6 +102,20 @@ class Observation():
         result += f"- test_info: {self.test_info}\n"
         return result
     
+    def snapshot(self) -> 'Observation':
+        """返回当前观测的独立快照，供规控器使用，规控器对快照的修改不会影响仿真状态
+        各背景要素状态仅包含数值属性，逐个复制即可，开销远小于copy.deepcopy
+        """
+        new = Observation.__new__(Observation)
+        new.ego_info = self.ego_info.copy()
+        new.object_info = {
+            category: {obj_name: obj_status.copy() for obj_name, obj_status in objects.items()}
+            for category, objects in self.object_info.items()
+        }
+        new.light_info = self.light_info
+        new.test_info = dict(self.test_info)
+        return new
+
     def update_ego_info(self, **kwargs):
         self.ego_info.update(**kwargs)
 
@@ -81,6 +132,35 @@ class Observation():
             'pedestrian': {},
         }
 
+    def update_objects(self, category: str, ids: list, values, fields: tuple = ObjectStatus.FIELDS) -> None:
+        """以一帧的全部交通参与者状态整体替换某一类别的背景要素
+        Args:
+            category (str): 背景要素类别，vehicle/bicycle/pedestrian
+            ids (list): 交通参与者名称
+            values (np.ndarray | list): (len(ids), len(fields)) 与ids一一对应的状态
+            fields (tuple, optional): values各列对应的属性名称. Defaults to ObjectStatus.FIELDS.
+        上一帧已存在的交通参与者原地更新，不再存在的交通参与者被移除
+        """
+        if category not in self.object_info.keys():
+            return
+        if hasattr(values, 'tolist'):
+            values = values.tolist()
+        yaw = fields.index('yaw') if 'yaw' in fields else -1
+        two_pi = 2 * math.pi
+        previous = self.object_info[category]
+        objects = {}
+        for obj_name, row in zip(ids, values):
+            obj_name = str(obj_name)
+            if yaw >= 0:
+                row = list(row)
+                row[yaw] = row[yaw] % two_pi
+            obj_status = previous.get(obj_name)
+            if obj_status is None:
+                obj_status = ObjectStatus()
+            obj_status.set_values(fields, [round(value, 3) for value in row])
+            objects[obj_name] = obj_status
+        self.object_info[category] = objects
+
     def update_object_info(self, category: str, obj_name: str, **kwargs):
         if category in self.object_info.keys():
             obj_name = str(obj_name)
@@ -129,6 +209,13 @@ class AvStruct:
              center_y + dx * math.sin(angle) - dy * math.cos(angle)),
         ]
 
+    def copy(self):
+        new = AvStruct.__new__(AvStruct)
+        new.__dict__.update(self.__dict__)
+        new.pos = list(self.pos)
+        new.bound = list(self.bound)
+        return new
+
 
 class ExternObject:
     def __init__(self):
@@ -148,6 +235,11 @@ class ExternObject:
                 av.update(value)
                 self.externObjDict[channel] = av
 
+    def copy(self):
+        new = ExternObject.__new__(ExternObject)
+        new.externObjDict = {channel: av.copy() for channel, av in self.externObjDict.items()}
+        return new
+
 if __name__ == "__main__":
     observation = Observation()
     print(observation)
@@ -1,11 +1,32 @@
 from lxml import etree
 from .opendriveparser.parser import parse_opendrive as parse_opendrive_xml
 from .network import Network
+from .discrete_network import DiscreteNetwork
+from .lane_graph import LaneGraph
+from .lane_index import LaneIndex
+from .cache import NetworkCache, network_cache
+from .plane_elements.border import BORDER_MEMO_SIZE
 
-def parse_opendrive(path_opendrive: str) -> None:
+# 离散化时保留的车道类型
+FILTER_TYPES = ["driving","biking", "onRamp", "offRamp", "exit", "entry", "sidewalk", "bidirectional"]
+
+def parse_opendrive(path_opendrive: str, precision: float = 0.5, use_cache: bool = True, memo_size: int = BORDER_MEMO_SIZE) -> DiscreteNetwork:
     """
     解析opendrive路网的信息，存储到self.replay_info.road_info。
+    Args:
+        path_opendrive (str): opendrive路网文件路径
+        precision (float, optional): 车道边界的离散化间隔. Defaults to 0.5.
+        use_cache (bool, optional): 是否使用磁盘缓存，缓存设置见cache.network_cache. Defaults to True.
+        memo_size (int, optional): 离散化过程中车道边界计算结果的内存缓存数量上限，解析结束后即释放，命中统计见DiscreteNetwork.border_memo_stats. Defaults to BORDER_MEMO_SIZE.
+    从缓存读取的路网中DiscreteLane不包含参数化车道对象（parametric_lane_group为None），其余信息与重新解析的结果一致
     """
+    use_cache = use_cache and network_cache.enabled
+    if use_cache:
+        key = network_cache.key(path_opendrive, precision, FILTER_TYPES)
+        open_drive_info = network_cache.load(key)
+        if open_drive_info is not None:
+            return open_drive_info
+
     with open(path_opendrive, 'r', encoding='utf-8') as fh:
         root = etree.parse(fh).getroot()
     
@@ -19,7 +40,10 @@ def parse_opendrive(path_opendrive: str) -> None:
     """将解析完成的Network类对象转换为DiscreteNetwork路网，其中使用的只有路网中各车道两侧边界的散点坐标
         车道边界点通过线性插值的方式得到，坐标点储存在<DiscreteNetwork.discretelanes.left_vertices/right_vertices> -> List"""
     open_drive_info = loadedRoadNetwork.export_discrete_network(
-        filter_types=["driving","biking", "onRamp", "offRamp", "exit", "entry", "sidewalk", "bidirectional"])  # -> <class> DiscreteNetwork
+        filter_types=FILTER_TYPES, precision=precision, memo_size=memo_size)  # -> <class> DiscreteNetwork
+    open_drive_info.border_memo_stats = loadedRoadNetwork.border_memo_stats
+    if use_cache:
+        network_cache.save(key, open_drive_info)
     return open_drive_info
 
 def main():
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+'''DiscreteNetwork的磁盘缓存，以路网文件内容的哈希值及离散化参数作为键，将各车道散点以.npz格式存储'''
+import os
+import threading
+import json
+import warnings
+import hashlib
+import numpy as np
+
+from .discrete_network import DiscreteLane, DiscreteNetwork
+
+# 缓存格式版本，离散化算法或存储格式变化时需递增，使旧缓存失效
+CACHE_VERSION = 1
+ROOT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+
+class NetworkCache:
+    '''DiscreteNetwork的磁盘缓存
+        - 键由路网文件内容的SHA-1、离散化精度precision及车道类型过滤条件共同决定，文件内容变化后自动失效
+        - 每个路网存储为一个.npz文件，读取时无需重新解析与离散化
+        - 缓存总大小超过max_bytes时按最近使用时间淘汰（LRU），命中时更新文件的修改时间作为使用时间
+    '''
+    def __init__(self, cache_dir: str = os.path.join(ROOT_PATH, 'cache', 'opendrive'), max_bytes: int = 512 * 1024 ** 2, enabled: bool = True):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+
+    def key(self, path_opendrive: str, precision: float, filter_types: list) -> str:
+        sha1 = hashlib.sha1()
+        with open(path_opendrive, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha1.update(chunk)
+        sha1.update(json.dumps([CACHE_VERSION, float(precision), sorted(filter_types or [])]).encode('utf-8'))
+        return sha1.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def load(self, key: str) -> DiscreteNetwork:
+        '''读取缓存的路网，不存在或文件损坏时返回None'''
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                network = self.unpack(data)
+        except (OSError, ValueError, KeyError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return network
+
+    def save(self, key: str, network: DiscreteNetwork) -> None:
+        '''写入缓存，先写入临时文件再重命名，避免并行的进程或线程读到不完整的文件，单个路网超过缓存上限时不写入'''
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **self.pack(network))
+            size = f.tell()
+        if size > self.max_bytes:
+            os.remove(tmp_path)
+            warnings.warn(f'Network cache entry of {size} bytes exceeds max_bytes={self.max_bytes}, skip caching!')
+            return
+        os.replace(tmp_path, path)
+        self.evict(keep=key)
+
+    def evict(self, keep: str = None) -> None:
+        '''缓存总大小超过上限时，按最近使用时间从旧到新删除缓存文件，键为keep的缓存（如刚写入的路网）不删除'''
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.npz') and name != f"{keep}.npz":
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        if keep is not None:
+            try:
+                total += os.path.getsize(self._path(keep))
+            except OSError:
+                pass
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self) -> None:
+        if not os.path.exists(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.npz'):
+                os.remove(os.path.join(self.cache_dir, name))
+
+    @staticmethod
+    def pack(network: DiscreteNetwork) -> dict:
+        '''将各车道的散点拼接为连续数组，并记录每条车道的散点数量'''
+        lanes = network.discretelanes
+        arrays = {}
+        for name in ('left', 'center', 'right'):
+            vertices = [getattr(lane, f"{name}_vertices") for lane in lanes]
+            arrays[f"{name}_count"] = np.array([len(v) for v in vertices], dtype=np.int64)
+            arrays[f"{name}_vertices"] = np.concatenate([np.reshape(v, (-1, 2)) for v in vertices]) if vertices else np.zeros((0, 2))
+        arrays['lane_id'] = np.array([lane.lane_id for lane in lanes], dtype=str)
+        arrays['links'] = np.array(json.dumps([[lane.predecessor, lane.successor] for lane in lanes]))
+        return arrays
+
+    @staticmethod
+    def unpack(data) -> DiscreteNetwork:
+        vertices = {}
+        for name in ('left', 'center', 'right'):
+            counts = data[f"{name}_count"]
+            # 空车道按原始解析结果还原为np.array([])
+            vertices[name] = [v if len(v) else np.array([]) for v in np.split(data[f"{name}_vertices"], np.cumsum(counts)[:-1])] if len(counts) else []
+        links = json.loads(str(data['links']))
+        network = DiscreteNetwork()
+        for idx, lane_id in enumerate(data['lane_id'].tolist()):
+            network.add_discretelane(DiscreteLane(
+                None,
+                vertices['left'][idx],
+                vertices['center'][idx],
+                vertices['right'][idx],
+                lane_id,
+                predecessor=links[idx][0],
+                successor=links[idx][1],
+            ))
+        return network
+
+
+# 默认缓存实例，可通过修改其属性调整缓存路径、大小上限或关闭缓存
+network_cache = NetworkCache()
@@ -51,15 +51,13 @@ class OpenDriveConverter:
                     idx = reference_border.width_coefficient_offsets.index(
                         lane_offset.start_pos
                     )
-                    del reference_border.width_coefficient_offsets[idx]
-                    del reference_border.width_coefficients[idx]
-                reference_border.width_coefficient_offsets.append(lane_offset.start_pos)
-                reference_border.width_coefficients.append(
+                    reference_border.remove_width(idx)
+                reference_border.append_width(
+                    lane_offset.start_pos,
                     lane_offset.polynomial_coefficients  # List[coefficients]
                 )
         else:
-            reference_border.width_coefficient_offsets.append(0.0)
-            reference_border.width_coefficients.append([0.0])
+            reference_border.append_width(0.0, [0.0])
 
         '''返回Border类的实例化对象，其包含两个关键属性，<width_coefficient_offsets> <width_coefficients>
         tborder (ds) = a + b*ds + c*ds² + d*ds³
@@ -213,8 +211,8 @@ class OpenDriveConverter:
             border.reference = lane_borders[-1]
 
         for width in lane.widths:
-            border.width_coefficient_offsets.append(width.start_offset)  # 区段起点对应s坐标
-            border.width_coefficients.append(
+            border.append_width(
+                width.start_offset,  # 区段起点对应s坐标
                 [x * coeff_factor for x in width.polynomial_coefficients]  # 三次多项式参数
             )
         return border
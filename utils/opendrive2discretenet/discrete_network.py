@@ -5,6 +5,9 @@ import numpy as np
 import warnings
 from typing import *
 
+from .lane_graph import LaneGraph
+from .lane_index import LaneIndex
+
 
 class DiscreteLane:
     '''离散化的车道对象，左右边界通过散点形式给出
@@ -26,6 +29,15 @@ class DiscreteLane:
         self._lane_id = lane_id
         self._predecessor = predecessor
         self._successor = successor
+        self._bbox = None
+        # 所属路网，车道变化时通知路网使其包围盒、空间索引及拓扑图失效
+        self._network = None
+
+    def _invalidate(self, vertices: bool = False) -> None:
+        if vertices:
+            self._bbox = None
+        if self._network is not None:
+            self._network._invalidate()
 
     @property
     def lane_id(self) -> int:
@@ -34,6 +46,7 @@ class DiscreteLane:
     @lane_id.setter
     def lane_id(self, id_: int):
         self._lane_id = id_
+        self._invalidate()
 
     @property
     def left_vertices(self) -> np.ndarray:
@@ -42,6 +55,7 @@ class DiscreteLane:
     @left_vertices.setter
     def left_vertices(self, polyline: np.ndarray):
         self._left_vertices = polyline
+        self._invalidate(vertices=True)
 
     @property
     def center_vertices(self) -> np.ndarray:
@@ -50,6 +64,7 @@ class DiscreteLane:
     @center_vertices.setter
     def center_vertices(self, polyline: np.ndarray):
         self._center_vertices = polyline
+        self._invalidate(vertices=True)
 
     @property
     def right_vertices(self) -> np.ndarray:
@@ -58,6 +73,19 @@ class DiscreteLane:
     @right_vertices.setter
     def right_vertices(self, polyline: np.ndarray):
         self._right_vertices = polyline
+        self._invalidate(vertices=True)
+
+    @property
+    def bbox(self) -> np.ndarray:
+        '''车道左右边界及中心线散点的包围盒[x_min, y_min, x_max, y_max]，车道无散点时为None'''
+        if self._bbox is None:
+            vertices = [np.reshape(v, (-1, 2)) for v in (self._left_vertices, self._center_vertices, self._right_vertices) if len(v)]
+            if vertices:
+                self._bbox = np.concatenate([
+                    np.min([v.min(axis=0) for v in vertices], axis=0),
+                    np.max([v.max(axis=0) for v in vertices], axis=0),
+                ])
+        return self._bbox
 
     @property
     def predecessor(self) -> list:
@@ -66,6 +94,7 @@ class DiscreteLane:
     @predecessor.setter
     def predecessor(self, predecessor: list):
         self._predecessor = predecessor
+        self._invalidate()
 
     @property
     def successor(self) -> list:
@@ -74,6 +103,7 @@ class DiscreteLane:
     @successor.setter
     def successor(self, successor: list):
         self._successor = successor
+        self._invalidate()
 
 
 class DiscreteNetwork:
@@ -81,11 +111,45 @@ class DiscreteNetwork:
     '''
     def __init__(self) -> None:
         self._discretelanes: Dict[int, DiscreteLane] = {}
+        self._lane_index = None
+        self._lane_graph = None
+        self._bbox = None
+        # 离散化过程中Border.calc缓存的命中统计（见BorderMemo.stats），从缓存或场景包读取的路网为None
+        self.border_memo_stats = None
 
     @property
     def discretelanes(self) -> List[DiscreteLane]:
         return list(self._discretelanes.values())
 
+    @property
+    def bbox(self) -> np.ndarray:
+        '''路网全部车道散点的包围盒[x_min, y_min, x_max, y_max]，由lane_bboxes求出并随路网对象保存，车道变化后重新计算，路网无散点时为None'''
+        if self._bbox is None:
+            lane_bboxes = self.lane_bboxes
+            valid = ~np.isnan(lane_bboxes).any(axis=1)
+            if valid.any():
+                self._bbox = np.concatenate([lane_bboxes[valid, :2].min(axis=0), lane_bboxes[valid, 2:].max(axis=0)])
+        return self._bbox
+
+    @property
+    def lane_bboxes(self) -> np.ndarray:
+        '''(N, 4) 各车道的包围盒，顺序与discretelanes一致，车道无散点时为nan'''
+        return np.array([lane.bbox if lane.bbox is not None else [np.nan] * 4 for lane in self.discretelanes]).reshape(-1, 4)
+
+    @property
+    def lane_index(self) -> LaneIndex:
+        '''车道空间索引，首次访问时构建并随路网对象保存，车道变化后重新构建'''
+        if self._lane_index is None:
+            self._lane_index = LaneIndex(self)
+        return self._lane_index
+
+    @property
+    def lane_graph(self) -> LaneGraph:
+        '''车道拓扑图，首次访问时构建并随路网对象保存，车道变化后重新构建'''
+        if self._lane_graph is None:
+            self._lane_graph = LaneGraph(self)
+        return self._lane_graph
+
     def add_discretelane(self, lane: DiscreteLane):
         assert isinstance(lane, DiscreteLane), 'provided lane is not of ' \
             'type DiscreteLane! type = {}'.format(type(lane))
@@ -94,4 +158,12 @@ class DiscreteNetwork:
             return False
         else:
             self._discretelanes[lane.lane_id] = lane
+            lane._network = self
+            self._invalidate()
             return True
+
+    def _invalidate(self) -> None:
+        '''车道增加或变化后，包围盒、空间索引及拓扑图在下次访问时重新构建'''
+        self._bbox = None
+        self._lane_index = None
+        self._lane_graph = None
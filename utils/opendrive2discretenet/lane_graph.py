@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+'''DiscreteNetwork的车道拓扑图，以整数序号及CSR邻接表描述车道间的前驱、后继与左右相邻关系，并提供路径规划接口'''
+import heapq
+from collections import OrderedDict
+
+import numpy as np
+
+
+def _to_csr(edges: list, num: int):
+    '''将(起点, 终点)边列表转换为CSR邻接表，同一起点的终点按升序排列'''
+    edges = np.array(sorted(set(edges)), dtype=np.int64).reshape(-1, 2)
+    indptr = np.zeros(num + 1, dtype=np.int64)
+    np.add.at(indptr, edges[:, 0] + 1, 1)
+    return np.cumsum(indptr), edges[:, 1].copy()
+
+
+class LaneGraph:
+    '''车道拓扑图，每个路网构建一次
+        - 车道序号与DiscreteNetwork.discretelanes的顺序一致，对应的车道ID为lane_ids[序号]，与LaneIndex的车道序号相同
+        - 后继、前驱关系合并自各车道的successor与predecessor，以CSR形式存储
+        - 左右相邻车道为同一路段中行驶方向相同、车道编号相邻的车道（按行驶方向区分左右），无相邻车道时为-1
+        - route: 查询两条车道间代价最小的车道序列，沿车道行驶的代价为车道长度，换道代价为lane_change_cost
+    同一目标车道的最短路径树在首次查询时计算并缓存，后续逐帧查询只需沿缓存的下一车道逐个回溯
+    '''
+    def __init__(self, network, lane_change_cost: float = 20.0, max_cached_goals: int = 64):
+        '''
+        Args:
+            network (DiscreteNetwork): 离散化的路网
+            lane_change_cost (float, optional): 一次换道的代价，单位：m. Defaults to 20.0.
+            max_cached_goals (int, optional): 缓存最短路径树的目标车道数量上限. Defaults to 64.
+        '''
+        lanes = network.discretelanes
+        self.lane_ids = np.array([lane.lane_id for lane in lanes], dtype=object)
+        self.lane_change_cost = float(lane_change_cost)
+        self.max_cached_goals = max_cached_goals
+        self._lookup = {lane_id: idx for idx, lane_id in enumerate(self.lane_ids)}
+        num = len(lanes)
+
+        self.lane_length = np.zeros(num)
+        links = []
+        for idx, lane in enumerate(lanes):
+            center = np.reshape(lane.center_vertices, (-1, 2))
+            if len(center) > 1:
+                self.lane_length[idx] = np.hypot(*np.diff(center, axis=0).T).sum()
+            # 过滤后路网中不存在的车道不参与构建
+            links += [(idx, self._lookup[lane_id]) for lane_id in lane.successor or [] if lane_id in self._lookup]
+            links += [(self._lookup[lane_id], idx) for lane_id in lane.predecessor or [] if lane_id in self._lookup]
+        self.successor_ptr, self.successor_idx = _to_csr(links, num)
+        self.predecessor_ptr, self.predecessor_idx = _to_csr([(end, start) for start, end in links], num)
+
+        self.left = np.full(num, -1, dtype=np.int64)
+        self.right = np.full(num, -1, dtype=np.int64)
+        for idx, lane_id in enumerate(self.lane_ids):
+            try:
+                road_section, lane, width = str(lane_id).rsplit('.', 2)
+                lane = int(lane)
+            except ValueError:
+                continue
+            if lane == 0:
+                continue
+            # 道路中心线始终位于行驶方向的左侧：编号绝对值小1的车道为左侧车道，大1的为右侧车道
+            step = 1 if lane > 0 else -1
+            self.left[idx] = self._lookup.get(f"{road_section}.{lane - step}.{width}", -1) if abs(lane) > 1 else -1
+            self.right[idx] = self._lookup.get(f"{road_section}.{lane + step}.{width}", -1)
+
+        self._trees = OrderedDict()
+
+    def __len__(self):
+        return len(self.lane_ids)
+
+    def index(self, lane_id) -> int:
+        '''车道ID对应的序号，不存在时为-1'''
+        return self._lookup.get(lane_id, -1)
+
+    def successors(self, lane: int) -> np.ndarray:
+        return self.successor_idx[self.successor_ptr[lane]:self.successor_ptr[lane + 1]]
+
+    def predecessors(self, lane: int) -> np.ndarray:
+        return self.predecessor_idx[self.predecessor_ptr[lane]:self.predecessor_ptr[lane + 1]]
+
+    def neighbors(self, lane: int) -> tuple:
+        '''左右相邻车道的序号，无相邻车道时为-1'''
+        return int(self.left[lane]), int(self.right[lane])
+
+    def shortest_path_tree(self, goal: int):
+        '''以goal为终点的最短路径树（反向Dijkstra）
+        Returns:
+            cost (np.ndarray): (N,) 各车道起点到达目标车道起点的最小代价，不可达为inf
+            next_lane (np.ndarray): (N,) 最优路径上的下一车道序号，目标车道及不可达车道为-1
+        '''
+        if goal in self._trees:
+            self._trees.move_to_end(goal)
+            return self._trees[goal]
+
+        num = len(self.lane_ids)
+        cost = np.full(num, np.inf)
+        next_lane = np.full(num, -1, dtype=np.int64)
+        cost[goal] = 0.0
+        heap = [(0.0, goal)]
+        while heap:
+            current, lane = heapq.heappop(heap)
+            if current > cost[lane]:
+                continue
+            # 前驱车道沿车道行驶至lane，相邻车道换道至lane
+            moves = [(int(prev), current + self.lane_length[prev]) for prev in self.predecessors(lane)]
+            moves += [(int(side), current + self.lane_change_cost) for side in (self.left[lane], self.right[lane]) if side != -1]
+            for prev, candidate in moves:
+                if candidate < cost[prev]:
+                    cost[prev] = candidate
+                    next_lane[prev] = lane
+                    heapq.heappush(heap, (candidate, prev))
+
+        self._trees[goal] = (cost, next_lane)
+        if len(self._trees) > self.max_cached_goals:
+            self._trees.popitem(last=False)
+        return cost, next_lane
+
+    def route(self, start: int, goal: int) -> list:
+        '''start到goal代价最小的车道序号序列（包含首尾车道），不可达时返回空列表'''
+        cost, next_lane = self.shortest_path_tree(goal)
+        if not np.isfinite(cost[start]):
+            return []
+        path = [int(start)]
+        while path[-1] != goal:
+            path.append(int(next_lane[path[-1]]))
+        return path
+
+    def route_through(self, lanes: list) -> list:
+        '''依次经过lanes中各车道的车道序号序列，任一段不可达时返回空列表'''
+        path = [int(lanes[0])] if len(lanes) else []
+        for start, goal in zip(lanes[:-1], lanes[1:]):
+            segment = self.route(start, goal)
+            if not segment:
+                return []
+            path += segment[1:]
+        return path
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+
+'''DiscreteNetwork的车道空间索引，以均匀网格索引各车道的四边形面片及中心线线段，用于批量的地图匹配查询'''
+import numpy as np
+
+
+class LaneIndex:
+    '''车道空间索引，每个路网构建一次
+        - 每条车道按相邻两个离散站点拆分为四边形面片（左右边界点），面片与同一站点区间的中心线线段一一对应
+        - 面片按其包围盒登记到覆盖的网格中（CSR形式存储），查询时只需检查附近网格内的面片
+        - locate: 批量查询各点所在的车道
+        - nearest_centerline: 批量查询各点最近的车道中心线，返回车道、纵向位置、横向偏移及车道航向角
+        - lanes_in_bbox: 查询与矩形范围相交的车道
+    查询返回的车道均为序号（与DiscreteNetwork.discretelanes的顺序一致），对应的车道ID为lane_ids[序号]，-1表示无对应车道
+    '''
+    def __init__(self, network, cell_size: float = 4.0):
+        '''
+        Args:
+            network (DiscreteNetwork): 离散化的路网
+            cell_size (float, optional): 网格边长，单位：m. Defaults to 4.0.
+        '''
+        self.cell_size = float(cell_size)
+        lanes = network.discretelanes
+        quads, starts, ends, seg_lane, seg_s = [], [], [], [], []
+        for lane_idx, lane in enumerate(lanes):
+            left, center, right = lane.left_vertices, lane.center_vertices, lane.right_vertices
+            if len(center) < 2 or not (len(left) == len(center) == len(right)):
+                continue
+            left, center, right = (np.asarray(v, dtype=float).reshape(-1, 2) for v in (left, center, right))
+            quads.append(np.stack([left[:-1], left[1:], right[1:], right[:-1]], axis=1))
+            starts.append(center[:-1])
+            ends.append(center[1:])
+            seg_lane.append(np.full(len(center) - 1, lane_idx))
+            length = np.hypot(*np.diff(center, axis=0).T)
+            seg_s.append(np.concatenate([[0.0], np.cumsum(length)[:-1]]))
+
+        self.lane_ids = np.array([lane.lane_id for lane in lanes], dtype=object)
+        if not quads:
+            quads, starts, ends = [np.zeros((0, 4, 2))], [np.zeros((0, 2))], [np.zeros((0, 2))]
+            seg_lane, seg_s = [np.zeros(0, dtype=int)], [np.zeros(0)]
+        self._quads = np.concatenate(quads)                      # (M, 4, 2) 车道面片
+        self._seg_lane = np.concatenate(seg_lane).astype(int)     # (M,) 面片所属车道序号
+        self._seg_s = np.concatenate(seg_s)                       # (M,) 中心线线段起点在车道上的纵向位置
+        self._seg_start = np.concatenate(starts)                  # (M, 2) 中心线线段起点
+        self._seg_end = np.concatenate(ends)                      # (M, 2) 中心线线段终点
+        delta = self._seg_end - self._seg_start
+        self._seg_length = np.hypot(delta[:, 0], delta[:, 1])
+        self._seg_heading = np.arctan2(delta[:, 1], delta[:, 0])
+        self._seg_bbox = np.concatenate([self._quads.min(axis=1), self._quads.max(axis=1)], axis=1)  # (M, 4) xmin, ymin, xmax, ymax
+        self._build_grid()
+
+    def __len__(self):
+        return len(self.lane_ids)
+
+    def _build_grid(self) -> None:
+        '''将各面片登记到其包围盒覆盖的网格中，以网格编号排序后按CSR形式存储'''
+        bbox = self._seg_bbox
+        self._origin = bbox[:, :2].min(axis=0) if len(bbox) else np.zeros(2)
+        extent = bbox[:, 2:].max(axis=0) - self._origin if len(bbox) else np.zeros(2)
+        self._shape = (np.floor(extent / self.cell_size).astype(int) + 1)
+        owner, keys = self._cells_in_range(bbox)
+        order = np.argsort(keys, kind='stable')
+        keys, self._cell_items = keys[order], owner[order]
+        self._cells, start = np.unique(keys, return_index=True)
+        self._cell_start = np.append(start, len(keys))
+
+    def _cells_in_range(self, bbox: np.ndarray):
+        '''返回与各矩形范围相交的网格编号
+        Args:
+            bbox: (K, 4) 矩形范围xmin, ymin, xmax, ymax
+        Returns:
+            owner: 各网格所属的矩形序号
+            keys: 网格编号，超出网格范围的部分已去除
+        '''
+        lower = np.floor((bbox[:, :2] - self._origin) / self.cell_size).astype(int)
+        upper = np.floor((bbox[:, 2:] - self._origin) / self.cell_size).astype(int)
+        lower = np.maximum(lower, 0)
+        upper = np.minimum(upper, self._shape - 1)
+        span = np.maximum(upper - lower + 1, 0)
+        count = span[:, 0] * span[:, 1]
+        owner = np.repeat(np.arange(len(bbox)), count)
+        local = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+        rows = span[owner, 1]
+        ix = lower[owner, 0] + local // np.maximum(rows, 1)
+        iy = lower[owner, 1] + local % np.maximum(rows, 1)
+        return owner, ix * self._shape[1] + iy
+
+    def _candidates(self, bbox: np.ndarray):
+        '''返回与各矩形范围位于同一网格的面片，同一面片可能重复出现'''
+        owner, keys = self._cells_in_range(bbox)
+        if not len(self._cells):
+            return owner[:0], owner[:0]
+        pos = np.minimum(np.searchsorted(self._cells, keys), len(self._cells) - 1)
+        valid = self._cells[pos] == keys
+        owner, pos = owner[valid], pos[valid]
+        start = self._cell_start[pos]
+        count = self._cell_start[pos + 1] - start
+        local = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+        return np.repeat(owner, count), self._cell_items[np.repeat(start, count) + local]
+
+    def _project(self, points: np.ndarray, seg: np.ndarray):
+        '''各点到对应中心线线段的投影，返回投影比例与距离'''
+        start, delta = self._seg_start[seg], self._seg_end[seg] - self._seg_start[seg]
+        rel = points - start
+        length_sq = self._seg_length[seg] ** 2
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ratio = np.where(length_sq > 0, np.clip((rel[:, 0] * delta[:, 0] + rel[:, 1] * delta[:, 1]) / length_sq, 0, 1), 0)
+        offset = rel - ratio[:, None] * delta
+        return ratio, np.hypot(offset[:, 0], offset[:, 1])
+
+    @staticmethod
+    def _first_per_owner(owner: np.ndarray, value: np.ndarray, num: int) -> np.ndarray:
+        '''按owner分组取value最小的元素序号，无元素的组为-1'''
+        best = np.full(num, -1)
+        if len(owner):
+            order = np.lexsort((value, owner))
+            first = np.ones(len(order), dtype=bool)
+            first[1:] = owner[order][1:] != owner[order][:-1]
+            best[owner[order][first]] = order[first]
+        return best
+
+    def locate(self, points) -> np.ndarray:
+        '''批量查询各点所在的车道
+        Args:
+            points: (N, 2) 查询点坐标
+        Returns:
+            (N,) 车道序号，不在任何车道内为-1；位于多条车道的重叠区域（如交叉口）时取中心线距离最近的车道
+        '''
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        owner, seg = self._candidates(np.concatenate([points, points], axis=1))
+        # 点位于四边形内：与各边的叉积同号
+        quads = self._quads[seg]
+        edges = np.roll(quads, -1, axis=1) - quads
+        rel = points[owner][:, None, :] - quads
+        cross = edges[..., 0] * rel[..., 1] - edges[..., 1] * rel[..., 0]
+        inside = (cross >= 0).all(axis=1) | (cross <= 0).all(axis=1)
+        owner, seg = owner[inside], seg[inside]
+        _, distance = self._project(points[owner], seg)
+        best = self._first_per_owner(owner, distance, len(points))
+        return np.where(best >= 0, self._seg_lane[seg[best]], -1)
+
+    def nearest_centerline(self, points, search_radius: float = None):
+        '''批量查询各点最近的车道中心线
+        Args:
+            points: (N, 2) 查询点坐标
+            search_radius (float, optional): 初始搜索半径，半径内无中心线的点逐次扩大搜索范围，不影响结果. Defaults to cell_size / 2.
+        Returns:
+            lane (np.ndarray): (N,) 最近中心线所属的车道序号，路网为空时为-1
+            s (np.ndarray): (N,) 投影点在车道中心线上的纵向位置，单位：m
+            lateral (np.ndarray): (N,) 到中心线的距离，位于中心线左侧为正，单位：m
+            heading (np.ndarray): (N,) 投影点处的车道航向角，单位：rad
+        '''
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        radius = self.cell_size / 2 if search_radius is None else float(search_radius)
+        num = len(points)
+        best_seg = np.full(num, -1)
+        best_ratio = np.zeros(num)
+        best_distance = np.full(num, np.inf)
+        if not len(self._seg_lane):
+            return np.full(num, -1), np.full(num, np.nan), np.full(num, np.nan), np.full(num, np.nan)
+
+        # 搜索范围内找到的最近中心线距离不大于搜索半径时结果即为全局最近，否则将搜索半径加倍后重新搜索
+        grid_lower = self._origin
+        grid_upper = self._origin + self._shape * self.cell_size
+        pending = np.arange(num)
+        while pending.size:
+            query = points[pending]
+            owner, seg = self._candidates(np.concatenate([query - radius, query + radius], axis=1))
+            ratio, distance = self._project(query[owner], seg)
+            best = self._first_per_owner(owner, distance, len(pending))
+            found = best >= 0
+            idx, best = pending[found], best[found]
+            best_seg[idx], best_ratio[idx], best_distance[idx] = seg[best], ratio[best], distance[best]
+            # 搜索范围已覆盖全部网格时同样为全局最近
+            covered = ((query - radius <= grid_lower) & (query + radius >= grid_upper)).all(axis=1)
+            pending = pending[(best_distance[pending] > radius) & ~covered]
+            radius *= 2
+
+        valid = best_seg >= 0
+        seg = np.where(valid, best_seg, 0)
+        delta = self._seg_end[seg] - self._seg_start[seg]
+        rel = points - self._seg_start[seg]
+        side = np.where(delta[:, 0] * rel[:, 1] - delta[:, 1] * rel[:, 0] < 0, -1.0, 1.0)
+        lane = np.where(valid, self._seg_lane[seg], -1)
+        s = np.where(valid, self._seg_s[seg] + best_ratio * self._seg_length[seg], np.nan)
+        lateral = np.where(valid, side * best_distance, np.nan)
+        heading = np.where(valid, self._seg_heading[seg], np.nan)
+        return lane, s, lateral, heading
+
+    def lanes_in_bbox(self, x_min: float, y_min: float, x_max: float, y_max: float) -> np.ndarray:
+        '''查询与矩形范围相交的车道（按面片包围盒判断），返回升序排列的车道序号'''
+        bbox = np.array([[x_min, y_min, x_max, y_max]], dtype=float)
+        _, seg = self._candidates(bbox)
+        seg_bbox = self._seg_bbox[seg]
+        overlap = (seg_bbox[:, 0] <= x_max) & (seg_bbox[:, 2] >= x_min) & (seg_bbox[:, 1] <= y_max) & (seg_bbox[:, 3] >= y_min)
+        return np.unique(self._seg_lane[seg[overlap]])
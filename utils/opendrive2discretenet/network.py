@@ -9,6 +9,7 @@ from .opendriveparser.elements.opendrive import OpenDrive
 
 from .utils import encode_road_section_lane_width_id
 from .converter import OpenDriveConverter
+from .plane_elements.border import Border, BorderMemo, BORDER_MEMO_SIZE
 
 
 def convert_to_new_lanelet_id(old_lanelet_id: str, ids_assigned: dict) -> int:
@@ -53,6 +54,7 @@ class Network:
     def __init__(self):
         self._planes = []
         self._link_index = None
+        self.border_memo_stats = None  # 最近一次export_discrete_network的Border.calc缓存命中统计
 
     def __eq__(self, other):
         return self.__dict__ == other.__dict__
@@ -104,12 +106,14 @@ class Network:
 
     # TODO: 基于解析得到的OpenD进一步将车道边界由参数形式转换为对应散点，以便进行地图可视化
     def export_discrete_network(
-        self, filter_types: list = None
+        self, filter_types: list = None, precision: float = 0.5, memo_size: int = BORDER_MEMO_SIZE
     ) -> DiscreteNetwork:
         """Export network as lanelet network.
 
         Args:
           filter_types: types of ParametricLane objects to be filtered. (Default value = None)
+          precision: space interval (in curve parameter ds) of the lane border vertices. (Default value = 0.5)
+          memo_size: 本次转换中Border.calc计算结果的缓存数量上限，转换结束后缓存即释放，命中统计见border_memo_stats
 
         Returns:
           The converted LaneletNetwork object.
@@ -118,19 +122,40 @@ class Network:
         # Convert groups to lanelets
         discrete_network = DiscreteNetwork()
 
-        for parametric_lane in self._planes:
-            if filter_types is not None and parametric_lane.type not in filter_types:
-                continue
+        memo = BorderMemo(memo_size)
+        borders = self._borders()
+        for border in borders:
+            border.memo = memo
+        try:
+            for parametric_lane in self._planes:
+                if filter_types is not None and parametric_lane.type not in filter_types:
+                    continue
 
-            discrete_lane = parametric_lane.to_discretelane()
+                discrete_lane = parametric_lane.to_discretelane(precision=precision)
 
-            discrete_lane.predecessor = self._link_index.get_predecessors(parametric_lane.id_)
-            discrete_lane.successor = self._link_index.get_successors(parametric_lane.id_)
+                discrete_lane.predecessor = self._link_index.get_predecessors(parametric_lane.id_)
+                discrete_lane.successor = self._link_index.get_successors(parametric_lane.id_)
 
-            discrete_network.add_discretelane(discrete_lane)
+                discrete_network.add_discretelane(discrete_lane)
+        finally:
+            for border in borders:
+                border.memo = None
+            self.border_memo_stats = memo.stats()
+            memo.clear()
 
         return discrete_network
 
+    def _borders(self) -> list:
+        """返回全部参数化车道引用的Border，包括作为参考边界间接引用的Border"""
+        borders = {}
+        for plane_group in self._planes:
+            for plane in plane_group.parametric_lanes:
+                for border in (plane.border_group.inner_border, plane.border_group.outer_border):
+                    while isinstance(border, Border) and id(border) not in borders:
+                        borders[id(border)] = border
+                        border = border.reference
+        return list(borders.values())
+
 
 class LinkIndex:
     """Overall index of all links in the file, save everything as successors, predecessors can be found via a reverse search"""
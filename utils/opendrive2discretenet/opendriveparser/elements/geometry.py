@@ -48,6 +48,7 @@ class Geometry(abc.ABC):
     def calc_position(self, s_pos):
         """Calculates the position of the geometry as if the starting point is (0/0)
         基于参考线s坐标计算对应的xy坐标
+        s_pos为数组时返回(n, 2)的坐标数组及(n,)的航向角数组
 
         Args:
           s_pos:
@@ -75,10 +76,10 @@ class Line(Geometry):
 
         """
         # 由s轴坐标计算对应的xy轴坐标，以array数组储存坐标
-        pos = self.start_position + np.array(
-            [s_pos * np.cos(self.heading), s_pos * np.sin(self.heading)]
+        pos = self.start_position + np.stack(
+            [s_pos * np.cos(self.heading), s_pos * np.sin(self.heading)], axis=-1
         )
-        tangent = self.heading
+        tangent = self.heading if np.ndim(s_pos) == 0 else np.full(np.shape(s_pos), self.heading)
 
         return (pos, tangent)
 
@@ -112,7 +113,7 @@ class Arc(Geometry):
         dx = -1 * a * np.cos(alpha)
         dy = a * np.sin(alpha)
 
-        pos = self.start_position + np.array([dx, dy])
+        pos = self.start_position + np.stack([dx, dy], axis=-1)
         tangent = self.heading + s_pos * self.curvature
 
         return (pos, tangent)
@@ -156,7 +157,7 @@ class Spiral(Geometry):
             self.heading,
         )
 
-        return (np.array([x, y]), t)
+        return (np.stack([x, y], axis=-1), t)
 
 
 class Poly3(Geometry):
@@ -204,7 +205,7 @@ class Poly3(Geometry):
         tangent = np.polynomial.polynomial.polyval(s_pos, dCoeffs)
 
         # 考虑参考线起点的坐标及航向角，反推对应点在惯性坐标系xy中的完整信息
-        return (self.start_position + np.array([srot, trot]), self.heading + tangent)
+        return (self.start_position + np.stack([srot, trot], axis=-1), self.heading + tangent)
 
 
 class ParamPoly3(Geometry):
@@ -271,4 +272,4 @@ class ParamPoly3(Geometry):
 
         tangent = np.arctan2(dy, dx)  # 反正切得最终在st坐标系中得斜率
 
-        return (self.start_position + np.array([xrot, yrot]), self.heading + tangent)
+        return (self.start_position + np.stack([xrot, yrot], axis=-1), self.heading + tangent)
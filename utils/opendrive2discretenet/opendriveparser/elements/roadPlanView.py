@@ -145,6 +145,7 @@ class PlanView:
 
         Either interpolate values if it possible or delegate calculation
         to geometries.
+        s_pos为数组时以数组运算批量计算，返回(n, 2)的坐标数组及(n,)的航向角数组
 
         Args:
           s_pos: Position on PlanView in ds.
@@ -154,6 +155,12 @@ class PlanView:
           Angle in radians at position s_pos.
         """
 
+        if np.ndim(s_pos):
+            s_pos = np.asarray(s_pos, dtype=float)
+            if self._precalculation is not None:
+                return self._interpolate_cached_values_array(s_pos)
+            return self._calc_geometry_array(s_pos)
+
         if self._precalculation is not None:
             # interpolate values
             return self.interpolate_cached_values(s_pos)
@@ -179,11 +186,7 @@ class PlanView:
         # start = time.time()
         # we need idx for angle interpolation
         # so idx can be used anyway in the other np.interp function calls
-        idx = np.abs(self._precalculation[:, 0] - s_pos).argmin()
-        if s_pos - self._precalculation[idx, 0] < 0 or idx + 1 == len(
-            self._precalculation
-        ):
-            idx -= 1
+        idx = self._precalculation_index(s_pos)
         result_pos_x = np.interp(
             s_pos,
             self._precalculation[idx:idx + 2, 0],
@@ -200,6 +203,22 @@ class PlanView:
         # self.cache_time += end - start
         return result_pos, result_tang
 
+    def _interpolate_cached_values_array(self, s_pos: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """interpolate_cached_values的数组版本，插值区间与逐点计算时一致"""
+        idx = self._precalculation_index(s_pos)
+        result_pos_x = np.interp(s_pos, self._precalculation[:, 0], self._precalculation[:, 1])
+        result_pos_y = np.interp(s_pos, self._precalculation[:, 0], self._precalculation[:, 2])
+        result_tang = self.interpolate_angle(idx, s_pos)
+        return np.stack([result_pos_x, result_pos_y], axis=-1), result_tang
+
+    def _precalculation_index(self, s_pos):
+        """二分查找s_pos所在的插值区间[idx, idx + 1]，s_pos可为标量或数组
+
+        区间左端点不大于s_pos，超出首末插值点时取首末区间
+        """
+        idx = np.searchsorted(self._precalculation[:, 0], s_pos, side='right') - 1
+        return np.clip(idx, 0, len(self._precalculation) - 2)
+
     def interpolate_angle(self, idx: int, s_pos: float) -> float:
         """Interpolate two angular values using the shortest angle between both values.
 
@@ -230,25 +249,8 @@ class PlanView:
           Angle in radians at position s_pos.
 
         """
-        try:
-            # get index of geometry which is at s_pos
-            mask = self._geo_lengths > s_pos  # 返回np.array[bool,..]
-            sub_idx = np.argmin(self._geo_lengths[mask] - s_pos)  # 返回子数组对应的索引
-            '''获得该s_pos对应的参考线子段索引
-            np.arange(self._geo_lengths.shape[0])获得self._geo_lengths数组每个元素的索引
-            np.arange(self._geo_lengths.shape[0])[mask]获得mask中为true的对应元素构成的子数组
-            np.arange(self._geo_lengths.shape[0])[mask][sub_idx] - 1获得参考线对应子段索引（-1：1.5位于1与2之间，属于以1开头的子段）
-            '''
-            geo_idx = np.arange(self._geo_lengths.shape[0])[mask][sub_idx] - 1
-        except ValueError:
-            # s_pos is after last geometry because of rounding error
-            if np.isclose(s_pos, self._geo_lengths[-1]):
-                geo_idx = self._geo_lengths.size - 2
-            else:
-                raise Exception(
-                    f"Tried to calculate a position outside of the borders of the reference path at s={s_pos}"
-                    f", but path has only length of l={ self._geo_lengths[-1]}"
-                )
+        # get index of geometry which is at s_pos
+        geo_idx = int(self._geometry_index(s_pos))
 
         # geo_idx is index which geometry to use
         # 输入当前s_pos在对应参考线子段上的相对位置（相对于start_position），输出对应的xy坐标及航向角
@@ -256,6 +258,37 @@ class PlanView:
             s_pos - self._geo_lengths[geo_idx]
         )
 
+    def _calc_geometry_array(self, s_pos: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """calc_geometry的数组版本，按所属的参考线子段分组后批量计算"""
+        geo_idx = self._geometry_index(s_pos)
+        result_pos = np.empty(s_pos.shape + (2,))
+        result_tang = np.empty(s_pos.shape)
+        for idx in np.unique(geo_idx).tolist():
+            selected = geo_idx == idx
+            result_pos[selected], result_tang[selected] = self._geometries[idx].calc_position(
+                s_pos[selected] - self._geo_lengths[idx]
+            )
+        return result_pos, result_tang
+
+    def _geometry_index(self, s_pos):
+        """二分查找s_pos所在的参考线子段索引，s_pos可为标量或数组
+
+        取第一个大于s_pos的子段终点，其前一个子段即为所属子段（1.5位于1与2之间，属于以1开头的子段）
+        """
+        geo_idx = np.searchsorted(self._geo_lengths, s_pos, side='right') - 1
+        last_idx = self._geo_lengths.size - 2
+        beyond = geo_idx > last_idx
+        if np.any(beyond):
+            # s_pos is after last geometry because of rounding error
+            outside = np.asarray(s_pos)[beyond] if np.ndim(s_pos) else s_pos
+            if not np.all(np.isclose(outside, self._geo_lengths[-1])):
+                raise Exception(
+                    f"Tried to calculate a position outside of the borders of the reference path at s={np.max(outside)}"
+                    f", but path has only length of l={ self._geo_lengths[-1]}"
+                )
+            geo_idx = np.where(beyond, last_idx, geo_idx)
+        return geo_idx
+
     def precalculate(self, precision: float = 0.5):
         """Precalculate coordinates of planView to save computing resources and time.
         Save result in _precalculation array.
@@ -272,9 +305,8 @@ class PlanView:
 
         num_steps = int(max(2, np.ceil(self.length / precision)))
         positions = np.linspace(0, self.length, num_steps)  # 对参考线进行线性插值
-        self._precalculation = np.empty([num_steps, 4])  # 返回num_steps*4的浮点数组，4对应[pos, coord[0], coord[1], tang]
-        for i, pos in enumerate(positions):
-            coord, tang = self.calc_geometry(pos)  # 输出对应点的xy坐标及航向角Tuple[np.ndarray, float]
-            self._precalculation[i] = (pos, coord[0], coord[1], tang)
+        # 返回num_steps*4的浮点数组，4对应[pos, coord[0], coord[1], tang]，全部插值点批量计算
+        coord, tang = self._calc_geometry_array(positions)
+        self._precalculation = np.column_stack([positions, coord, tang])
         # end = time.time()
         # self.cache_time += end - start
@@ -1,8 +1,49 @@
 # -*- coding: utf-8 -*-
 
-from functools import lru_cache
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
 import numpy as np
 
+# 单次路网转换中Border.calc计算结果的默认缓存数量上限
+BORDER_MEMO_SIZE = 200000
+
+
+class BorderMemo:
+    """Border.calc计算结果的记忆化缓存，作用域为一次路网转换
+    - 以(border, s_pos, width_offset, is_last_pos)为键（数组以其字节内容为键），超过maxsize时淘汰最久未使用的结果
+    - 由Network.export_discrete_network创建并挂载到各Border，转换结束后卸载并释放，
+      不会像类级别的lru_cache一样持有全部Border及其所属路网直至进程结束
+    """
+    def __init__(self, maxsize: int = BORDER_MEMO_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def get(self, key):
+        """返回缓存的结果，未命中时返回None"""
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[key] = value
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data), 'maxsize': self.maxsize}
+
 
 class Border:
     """A lane border defines a path along a whole lane section
@@ -24,6 +65,38 @@ class Border:
 
         self.reference = None
 
+        # 路网转换期间挂载的BorderMemo，为None时不缓存计算结果
+        self.memo = None
+
+        # width_coefficient_offsets的二分查找索引，首次查询时建立，增删width时失效
+        self._width_index_built = False
+        self._sorted_width_offsets = None
+
+    def append_width(self, offset: float, coefficients: list) -> None:
+        """追加一段width，width_coefficient_offsets与width_coefficients须经此方法修改以使二分查找索引失效"""
+        self.width_coefficient_offsets.append(offset)
+        self.width_coefficients.append(coefficients)
+        self._width_index_built = False
+
+    def remove_width(self, idx: int) -> None:
+        """删除第idx段width"""
+        del self.width_coefficient_offsets[idx]
+        del self.width_coefficients[idx]
+        self._width_index_built = False
+
+    def _width_index(self) -> list:
+        """返回单调不减的width_coefficient_offsets用于二分查找，offsets非单调时返回None
+
+        对单调不减的offsets，满足条件的最后一个offset即为不大于（is_last_pos时为小于）s_pos的最大offset，
+        与逐个反向扫描的结果一致
+        """
+        if not self._width_index_built:
+            offsets = self.width_coefficient_offsets
+            monotonic = all(a <= b for a, b in zip(offsets, offsets[1:]))
+            self._sorted_width_offsets = list(offsets) if monotonic else None
+            self._width_index_built = True
+        return self._sorted_width_offsets
+
     def _get_width_index(self, s_pos: float, is_last_pos: bool) -> int:
         """Get the index of the width which applies at position s_pos.
 
@@ -32,6 +105,17 @@ class Border:
         Returns:
           Index for self.width_coefficient_offsets or self.width_coefficients.
         """
+        offsets = self._width_index()
+        if offsets is not None:
+            if is_last_pos and s_pos != 0:
+                idx = bisect_left(offsets, s_pos) - 1
+            else:
+                idx = bisect_right(offsets, s_pos) - 1
+            if idx < 0:
+                return len(offsets)
+            # 重复的offset取第一次出现的位置，与list.index一致
+            return bisect_left(offsets, offsets[idx])
+
         return next(
             (
                 self.width_coefficient_offsets.index(n)
@@ -44,6 +128,28 @@ class Border:
             len(self.width_coefficient_offsets),
         )
 
+    def _get_width_index_array(self, s_pos: np.ndarray, is_last_pos: np.ndarray) -> np.ndarray:
+        """_get_width_index的数组版本，逐点的判断条件与_get_width_index一致"""
+        offsets = self._width_index()
+        if offsets:
+            sorted_offsets = np.asarray(offsets, dtype=float)
+            strict = is_last_pos & (s_pos != 0)
+            idx = np.where(
+                strict,
+                np.searchsorted(sorted_offsets, s_pos, side='left'),
+                np.searchsorted(sorted_offsets, s_pos, side='right'),
+            ) - 1
+            first = np.searchsorted(sorted_offsets, sorted_offsets[np.maximum(idx, 0)], side='left')
+            return np.where(idx < 0, len(offsets), first)
+
+        width_idx = np.full(s_pos.shape, len(self.width_coefficient_offsets))
+        found = np.zeros(s_pos.shape, dtype=bool)
+        for n in self.width_coefficient_offsets[::-1]:
+            match = ((n <= s_pos) & (~is_last_pos | (s_pos == 0))) | ((n < s_pos) & is_last_pos)
+            width_idx[match & ~found] = self.width_coefficient_offsets.index(n)
+            found |= match
+        return width_idx
+
     def get_next_width_coeffs(self, s_pos: float, is_last_pos: bool = False) -> list:
         """Get width coefficients which apply at position s_pos.
 
@@ -57,10 +163,39 @@ class Border:
         width_idx = self._get_width_index(s_pos, is_last_pos)
         return self.width_coefficients[width_idx]
 
+    def calc(self, s_pos: float, width_offset: float = 0.0, is_last_pos: bool = False):
+        """Calculate the Cartesian coordinates and the tangential direction of the border.
+
+        s_pos为数组时以数组运算批量计算全部位置（is_last_pos可为同形状的数组），
+        返回(n, 2)的坐标数组及(n,)的航向角数组，逐点结果与标量计算完全一致
+        """
+        memo = self.memo
+        if np.ndim(s_pos):
+            s_pos = np.asarray(s_pos, dtype=float)
+            if memo is None:
+                return self._calc_array(s_pos, width_offset, is_last_pos)
+            # 相邻车道的边界逐级引用同一参考边界，同一组位置会被重复计算
+            is_last_pos = np.broadcast_to(np.asarray(is_last_pos, dtype=bool), s_pos.shape)
+            key = (self, s_pos.tobytes(), width_offset, is_last_pos.tobytes())
+            result = memo.get(key)
+            if result is None:
+                result = self._calc_array(s_pos, width_offset, is_last_pos)
+                memo.put(key, result)
+            # 返回副本，避免不同车道的散点共享同一数组
+            return result[0].copy(), result[1].copy()
+
+        if memo is None:
+            return self._calc_scalar(s_pos, width_offset, is_last_pos)
+        key = (self, s_pos, width_offset, is_last_pos)
+        result = memo.get(key)
+        if result is None:
+            result = self._calc_scalar(s_pos, width_offset, is_last_pos)
+            memo.put(key, result)
+        return result
+
     # NOTE: might by more efficient to calculate each border once
     # instead of recalculating them over and over.
-    @lru_cache(maxsize=200000)
-    def calc(self, s_pos: float, width_offset: float = 0.0, is_last_pos: bool = False):
+    def _calc_scalar(self, s_pos: float, width_offset: float = 0.0, is_last_pos: bool = False):
         """Calculate the Cartesian coordinates and the tangential direction of
         the border by calculating position of reference border at s_pos
         and then adding the width in orthogonal direction to the reference position.
@@ -109,3 +244,40 @@ class Border:
         )
 
         return coord, tang_angle
+
+    def _calc_array(self, s_pos: np.ndarray, width_offset: float, is_last_pos) -> tuple:
+        """calc的数组版本，各步运算顺序与_calc_scalar一致"""
+        s_pos = np.where(np.isclose(s_pos, 0), 0.0, s_pos)
+        is_last_pos = np.broadcast_to(np.asarray(is_last_pos, dtype=bool), s_pos.shape)
+
+        try:
+            ref_coord, tang_angle = self.reference.calc(
+                self.ref_offset + s_pos, is_last_pos=is_last_pos
+            )
+        except TypeError:
+            ref_coord, tang_angle = self.reference.calc(self.ref_offset + s_pos)
+
+        if not self.width_coefficients or not self.width_coefficient_offsets:
+            raise Exception("No entries for width definitions.")
+
+        width_idx = self._get_width_index_array(s_pos, is_last_pos)
+
+        # 各段多项式系数补零至相同阶数后按polyval的Horner顺序计算
+        order = max(len(coeffs) for coeffs in self.width_coefficients)
+        coefficients = np.zeros((len(self.width_coefficients), order))
+        for idx, coeffs in enumerate(self.width_coefficients):
+            coefficients[idx, :len(coeffs)] = coeffs
+        coefficients = coefficients[width_idx]
+        ds = s_pos - np.asarray(self.width_coefficient_offsets, dtype=float)[width_idx]
+        distance = coefficients[:, -1] + ds * 0
+        for i in range(2, order + 1):
+            distance = coefficients[:, -i] + distance * ds
+        distance = distance + width_offset
+
+        # New point is in orthogonal direction
+        ortho = tang_angle + np.pi / 2
+        coord = ref_coord + np.stack(
+            [distance * np.cos(ortho), distance * np.sin(ortho)], axis=-1
+        )
+
+        return coord, tang_angle
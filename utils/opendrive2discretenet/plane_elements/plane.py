@@ -183,18 +183,11 @@ class ParametricLane:
 
         poses = np.linspace(0, self.length, num_steps)
 
-        left_vertices = []
-        right_vertices = []
-
-        # width difference between original_width and width with merge algo applied
-
         # calculate left and right vertices of lanelet
-        for pos in poses:
-            inner_pos = self.calc_border("inner", pos)[0]
-            outer_pos = self.calc_border("outer", pos)[0]
-            left_vertices.append(inner_pos)
-            right_vertices.append(outer_pos)
-        return (np.array(left_vertices), np.array(right_vertices))
+        # 全部离散点以数组形式一次性计算
+        left_vertices = self.calc_border("inner", poses)[0]
+        right_vertices = self.calc_border("outer", poses)[0]
+        return (left_vertices, right_vertices)
 
     def zero_width_change_positions(self) -> float:
         """Position where the inner and outer Border have zero minimal distance change.
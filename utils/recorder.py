@@ -1,86 +1,327 @@
 import os
+import json
+import numpy as np
 import pandas as pd
-from functools import reduce
+from typing import Tuple
 
 from utils.observation import Observation
+from utils.ScenarioManager.ScenarioInfo import ScenarioInfo
+
+# 各输出格式对应的文件后缀
+RESULT_SUFFIX = {
+    'csv': '.csv',
+    'parquet': '.parquet',
+    'feather': '.feather',
+    'npz': '.npz',
+}
+LONG_COLUMNS = ['t', 'name', 'field', 'value']
+
+
+class DataBuffer:
+    """按行追加数据的二维NumPy缓冲区，容量不足时成倍扩容，单次追加的均摊开销为常数
+    """
+    def __init__(self, width: int, capacity: int = 256):
+        self._data = np.full((capacity, width), np.nan)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def data(self) -> np.ndarray:
+        return self._data[:self._size]
+
+    def append(self, row) -> None:
+        if self._size == len(self._data):
+            self._data = np.concatenate([self._data, np.full_like(self._data, np.nan)])
+        self._data[self._size] = row
+        self._size += 1
+
+    def extend(self, rows: np.ndarray) -> None:
+        while self._size + len(rows) > len(self._data):
+            self._data = np.concatenate([self._data, np.full_like(self._data, np.nan)])
+        self._data[self._size:self._size + len(rows)] = rows
+        self._size += len(rows)
+
+    def replace_last(self, row) -> None:
+        self._data[self._size - 1] = row
+
+    def truncate(self, size: int) -> None:
+        self._data[size:self._size] = np.nan
+        self._size = size
 
 
 class DataRecord:
     def __init__(self):
-        self.control_data  = pd.DataFrame(columns=['acc', 'rot'])
-        self.ego_data  = pd.DataFrame(columns=['x', 'y', 'v', 'a', 'yaw', 'rot', 'width', 'length'])
-        self.object_data = {}
+        self.control_column = ['acc', 'rot']
+        self.ego_column = ['x', 'y', 'v', 'a', 'yaw', 'rot', 'width', 'length']
         self.object_column = ['x', 'y', 'v', 'a', 'yaw', 'width', 'length']
-        self.end_data = pd.DataFrame(columns=['end'])
+        # 每一时刻的时间戳、控制量、ego车辆信息和结束状态按行存储在同一缓冲区中
+        self.frame_data = DataBuffer(1 + len(self.control_column) + len(self.ego_column) + 1)
+        # 交通参与者信息以长表形式存储，每行为(帧序号, 交通参与者序号, 车辆信息)
+        self.object_data = DataBuffer(2 + len(self.object_column))
+        self.object_names = []
+        self.object_index = {}
+        # 当前帧在object_data中的起始行，用于同一时刻重复记录时的覆盖
+        self._frame_start = 0
+        # 已写出到分块文件中的帧数、长表行数及交通参与者数
+        self._flushed = [0, 0, 0]
 
     def add_data(self, action: list, observation: Observation):
         """将输入的观察值进行存储
         """
-        # 首先将已经建立了对应DataFrame的车辆名提取出来
-        stored_vehicles = self.object_data.keys()
         # 提取observation对应的时刻
         t = observation.test_info['t']
-        
-        # 记录控制量
-        self.control_data.loc[t] = [round(action[0], 3), round(action[1], 3)]
-        # 记录ego车辆信息
-        self.ego_data.loc[t] = observation.ego_info.__dict__
-        # 记录结束状态
-        self.end_data.loc[t] = observation.test_info['end']
-        
+
+        # 记录时间戳、控制量、ego车辆信息和结束状态，同一时刻重复记录时覆盖上一次的记录
+        ego_info = observation.ego_info.__dict__
+        row = [t, round(action[0], 3), round(action[1], 3), *[ego_info[key] for key in self.ego_column], observation.test_info['end']]
+        if len(self.frame_data) > 0 and self.frame_data.data[-1, 0] == t:
+            self.frame_data.replace_last(row)
+            self.object_data.truncate(self._frame_start)
+        else:
+            self.frame_data.append(row)
+            self._frame_start = len(self.object_data)
+        frame = len(self.frame_data) - 1
+
         # 遍历observation中的所有车辆
         for obj_type in observation.object_info:
             for vehicle_name, vehicle_info in observation.object_info[obj_type].items():
-                # 如果vehi_name对应的车还没有建立DataFrame,则先建立
-                if vehicle_name not in stored_vehicles:
-                    self._add_vehicle_frame(vehicle_name)
-                # 为t时刻的数据建立当前时刻的DataFrame
-                self.extend_vehicle_info(t, vehicle_name, vehicle_info.__dict__)
-    
-    def extend_vehicle_info(self, t, vehicle_name: str, veh_info: dict) -> None:
-        """为某一交通参与者的DataFrame增加一行
+                self.extend_vehicle_info(frame, vehicle_name, vehicle_info.__dict__)
+
+    def extend_vehicle_info(self, frame: int, vehicle_name: str, veh_info: dict) -> None:
+        """为某一交通参与者在长表中增加一行
+        """
+        if vehicle_name not in self.object_index:
+            self.object_index[vehicle_name] = len(self.object_names)
+            self.object_names.append(vehicle_name)
+        self.object_data.append([frame, self.object_index[vehicle_name], *[veh_info[key] for key in self.object_column]])
+
+    def pending_frames(self) -> int:
+        """尚未写出到分块文件中的帧数
         """
-        sub_frame = pd.DataFrame(
-            veh_info,
-            columns=self.object_column,
-            index=[t],
-        )
-        sub_frame.columns = list(self.object_data[vehicle_name].columns)
-        self.object_data[vehicle_name] = pd.concat([self.object_data[vehicle_name], sub_frame])
+        return len(self.frame_data) - self._flushed[0]
+
+    def write_chunk(self, f) -> None:
+        """将尚未写出的记录以追加方式写入分块文件，最后一帧可能被重复记录覆盖，暂不写出
+        """
+        frame_end, object_end, name_end = len(self.frame_data) - 1, self._frame_start, len(self.object_names)
+        frame_start, object_start, name_start = self._flushed
+        if frame_end <= frame_start:
+            return
+        np.save(f, self.frame_data.data[frame_start:frame_end])
+        np.save(f, self.object_data.data[object_start:object_end])
+        np.save(f, np.array(self.object_names[name_start:name_end], dtype=str))
+        self._flushed = [frame_end, object_end, name_end]
+
+    @classmethod
+    def load_chunks(cls, chunk_path: str) -> 'DataRecord':
+        """从分块文件中恢复记录，文件末尾未完整写入的分块会被丢弃
+        """
+        record = cls()
+        with open(chunk_path, 'rb') as f:
+            while True:
+                try:
+                    frame_chunk, object_chunk, name_chunk = [np.load(f) for _ in range(3)]
+                except (EOFError, ValueError, OSError):
+                    break
+                for name in name_chunk.tolist():
+                    record.object_index[name] = len(record.object_names)
+                    record.object_names.append(name)
+                record.frame_data.extend(frame_chunk)
+                record.object_data.extend(object_chunk)
+        return record
 
     def merge_frame(self) -> pd.DataFrame:
-        """将存储的所有交通参与者的DataFrame，按照时间进行合并，返回完整的DataFrame
+        """将存储的所有交通参与者的数据，按照时间一次性展开为宽表，返回完整的DataFrame
 
         """
-        self.ego_data.columns = [f"{i}_ego" for i in self.ego_data.columns]
-        # 取出每辆车的DataFrame，组成列表
-        object_dataframe_group = [self.object_data[vehi_name] for vehi_name in list(self.object_data.keys())]
-    
-        return reduce(lambda x, y: pd.merge(x, y, how="outer", left_index=True, right_index=True), [self.control_data, self.ego_data, *object_dataframe_group, self.end_data])
+        frame_data, object_data = self.frame_data.data, self.object_data.data
+        n_field = len(self.object_column)
+        # 将长表中的每一行直接写入宽表中对应的行与列
+        object_wide = np.full((len(frame_data), len(self.object_names) * n_field), np.nan)
+        rows = object_data[:, 0].astype(int)
+        cols = object_data[:, 1].astype(int) * n_field
+        object_wide[rows[:, None], cols[:, None] + np.arange(n_field)] = object_data[:, 2:]
 
-    def _add_vehicle_frame(self, vehicle_name: str):
-        """为某一交通参与者创造对应的小DataFrame
+        columns = self.control_column + [f"{i}_ego" for i in self.ego_column]
+        columns += [f"{i}_{vehi_name}" for vehi_name in self.object_names for i in self.object_column]
+        data_output = pd.DataFrame(np.hstack([frame_data[:, 1:-1], object_wide]), index=frame_data[:, 0], columns=columns)
+        data_output['end'] = frame_data[:, -1].astype(int)
+        return data_output
+
+    def long_frame(self) -> pd.DataFrame:
+        """以长表形式返回全部记录，每行为(t, name, field, value)
+            name为control时对应控制量，为ego时对应主车信息，为test时对应结束状态，其余为背景要素名称
         """
-        self.object_data[vehicle_name] = pd.DataFrame(
-            None,
-            columns=[i + "_" + vehicle_name for i in self.object_column]
-        )
+        frame_data, object_data = self.frame_data.data, self.object_data.data
+        t = frame_data[:, 0]
+        n_control, n_ego = len(self.control_column), len(self.ego_column)
+        parts = [
+            (t, 'control', self.control_column, frame_data[:, 1:1 + n_control]),
+            (t, 'ego', self.ego_column, frame_data[:, 1 + n_control:1 + n_control + n_ego]),
+            (t[object_data[:, 0].astype(int)], np.array(self.object_names, dtype=object)[object_data[:, 1].astype(int)], self.object_column, object_data[:, 2:]),
+            (t, 'test', ['end'], frame_data[:, -1:]),
+        ]
+        long_output = pd.concat([
+            pd.DataFrame({
+                't': np.repeat(part_t, len(fields)),
+                'name': np.repeat(name, len(fields)) if isinstance(name, np.ndarray) else name,
+                'field': np.tile(fields, len(part_t)),
+                'value': values.ravel(),
+            }) for part_t, name, fields, values in parts
+        ], ignore_index=True)
+        return long_output.sort_values('t', kind='stable', ignore_index=True)
+
+
+def _write_result(data_output: pd.DataFrame, output_path: str, output_format: str, metadata: dict) -> None:
+    """按照指定格式写出结果文件，除csv外均在文件中嵌入测试相关的元数据
+    """
+    if output_format == 'csv':
+        data_output.to_csv(output_path, index=False)
+    elif output_format in ['parquet', 'feather']:
+        try:
+            import pyarrow as pa
+            import pyarrow.feather
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError(f"Output format \"{output_format}\" requires pyarrow, please install it first!")
+        table = pa.Table.from_pandas(data_output, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), b'onsite': json.dumps(metadata).encode()})
+        if output_format == 'parquet':
+            pa.parquet.write_table(table, output_path)
+        else:
+            pa.feather.write_feather(table, output_path)
+    elif output_format == 'npz':
+        columns = {f"col_{i}": data_output[col].to_numpy() for i, col in enumerate(data_output.columns)}
+        columns = {key: value.astype(str) if value.dtype == object else value for key, value in columns.items()}
+        with open(output_path, 'wb') as f:
+            np.savez(f, __columns__=np.array(data_output.columns, dtype=str), __metadata__=np.array(json.dumps(metadata)), **columns)
+    else:
+        raise ValueError(f"Unknown output format \"{output_format}\", please choose in {list(RESULT_SUFFIX.keys())}")
+
+def long_to_wide(long_output: pd.DataFrame) -> pd.DataFrame:
+    """将(t, name, field, value)长表还原为与宽表输出一致的DataFrame
+    """
+    column = np.where(
+        long_output['name'].isin(['control', 'test']),
+        long_output['field'],
+        long_output['field'] + '_' + long_output['name'].astype(str),
+    )
+    columns = list(dict.fromkeys(column))
+    columns = [col for col in columns if col != 'end'] + ['end']
+    data_output = long_output.assign(column=column).pivot(index='t', columns='column', values='value')[columns]
+    data_output['end'] = data_output['end'].astype(int)
+    return data_output.rename_axis(None, axis=1).reset_index()
+
+def chunk_path_of(output_path: str) -> str:
+    """结果文件对应的分块文件路径，存放于输出文件夹下的.partial子文件夹中，避免被误判为已有输出
+    """
+    return os.path.join(os.path.dirname(output_path), '.partial', os.path.basename(output_path) + '.chunks')
+
+def recover_result(output_path: str, config: dict = None, scene_info: ScenarioInfo = None) -> bool:
+    """测试进程被终止或崩溃后，将已写出的分块记录转换为带有截断标记的结果文件
+    Returns:
+        bool: 是否存在可恢复的记录
+    """
+    chunk_path = chunk_path_of(output_path)
+    if not os.path.exists(chunk_path):
+        return False
+    recorder = Recorder(config)
+    recorder.data = DataRecord.load_chunks(chunk_path)
+    recorder.output(output_path, scene_info)
+    return len(recorder.data.frame_data) > 0
+
+def load_result(result_path: str) -> Tuple[pd.DataFrame, dict]:
+    """读取任意格式与组织形式的结果文件，也可直接读取测试过程中写出的分块文件
+    Returns:
+        data_output: 宽表形式的DataFrame，第一列为时间戳t
+        metadata: 结果文件的元数据，包含name, mode, dt, end, layout, truncated
+    """
+    suffix = os.path.splitext(result_path)[1]
+    metadata = {}
+    if suffix == '.chunks':
+        data_output = DataRecord.load_chunks(result_path).merge_frame().rename_axis('t').reset_index()
+        metadata['truncated'] = True
+        result_path = result_path[:-len(suffix)]
+    elif suffix == '.csv':
+        data_output = pd.read_csv(result_path)
+    elif suffix in ['.parquet', '.feather']:
+        import pyarrow.feather
+        import pyarrow.parquet
+        table = pyarrow.parquet.read_table(result_path) if suffix == '.parquet' else pyarrow.feather.read_table(result_path)
+        metadata = json.loads((table.schema.metadata or {}).get(b'onsite', b'{}'))
+        data_output = table.to_pandas()
+    elif suffix == '.npz':
+        with np.load(result_path) as f:
+            metadata = json.loads(str(f['__metadata__']))
+            data_output = pd.DataFrame({col: f[f"col_{i}"] for i, col in enumerate(f['__columns__'])})
+    else:
+        raise ValueError(f"Unknown result file suffix \"{suffix}\", please choose in {list(RESULT_SUFFIX.values())}")
+
+    if list(data_output.columns) == LONG_COLUMNS:
+        metadata.setdefault('layout', 'long')
+        data_output = long_to_wide(data_output)
+    else:
+        metadata.setdefault('layout', 'wide')
+        data_output = data_output.rename(columns={data_output.columns[0]: 't'})
+
+    # csv文件无法嵌入元数据，根据文件名及文件内容补全
+    result_file = os.path.basename(result_path)
+    metadata.setdefault('mode', result_file.split('_')[0])
+    metadata.setdefault('name', '_'.join(result_file.split('_')[2:-1]))
+    metadata.setdefault('dt', round(float(data_output['t'].iloc[1] - data_output['t'].iloc[0]), 3) if len(data_output) > 1 else None)
+    metadata.setdefault('end', int(data_output['end'].iloc[-1]) if len(data_output) else None)
+    # 最后一帧仍处于运行状态说明测试未正常结束，结果被截断
+    metadata.setdefault('truncated', metadata['end'] in [-1, None])
+    return data_output, metadata
 
 
 # 记录模块
 class Recorder:
-    def __init__(self):
+    def __init__(self, config: dict = None, output_path: str = None):
+        config = config or {}
         self.end_status = -1
         self.data = DataRecord()
+        # 每累计flushChunkSize帧将记录追加写出到分块文件，测试异常终止时仍可恢复已记录的数据，为0时不写出
+        self.chunk_size = config.get('flushChunkSize', 100)
+        self.chunk_path = chunk_path_of(output_path) if output_path and self.chunk_size > 0 else None
+        if self.chunk_path and os.path.exists(self.chunk_path):
+            os.remove(self.chunk_path)
+        # 输出文件的数据组织形式，wide为每行一个时刻的宽表，long为(t, name, field, value)长表
+        self.layout = config.get('outputLayout', 'wide')
+        # 输出文件格式，可选csv, parquet, feather, npz
+        self.output_format = config.get('outputFormat', 'csv')
 
     def record(self, action: list, observation: Observation):
         if self.end_status == -1:
             self.data.add_data(action, observation)
             self.end_status = observation.test_info['end']
+            if self.chunk_path and self.data.pending_frames() > self.chunk_size:
+                self.flush()
+
+    def flush(self):
+        if not os.path.exists(os.path.dirname(self.chunk_path)):
+            os.makedirs(os.path.dirname(self.chunk_path))
+        with open(self.chunk_path, 'ab') as f:
+            self.data.write_chunk(f)
     
-    def output(self, output_path):
+    def output(self, output_path: str, scene_info: ScenarioInfo = None):
         if not os.path.exists(os.path.dirname(output_path)):
             os.makedirs(os.path.dirname(output_path))
-        data_output = self.data.merge_frame()
+        if self.layout == 'long':
+            data_output = self.data.long_frame()
+        else:
+            data_output = self.data.merge_frame().rename_axis('t').reset_index()
+            if self.output_format == 'csv':
+                # 与原有csv输出保持一致，时间戳列不设列名
+                data_output = data_output.rename(columns={'t': ''})
         if not data_output.empty:
-            data_output.to_csv(output_path)
+            metadata = {'layout': self.layout, 'end': int(self.end_status), 'truncated': self.end_status == -1}
+            if scene_info is not None:
+                metadata.update(name=scene_info.name, mode=scene_info.type, dt=scene_info.task_info['dt'])
+            _write_result(data_output, output_path, self.output_format, metadata)
+        # 完整结果写出后删除分块文件
+        chunk_path = chunk_path_of(output_path)
+        if os.path.exists(chunk_path):
+            os.remove(chunk_path)
@@ -1,11 +1,10 @@
-from utils.opendrive2discretenet import parse_opendrive
+from utils.opendrive2discretenet import parse_opendrive, BORDER_MEMO_SIZE
 from utils.ScenarioManager import select_scenario_manager
 from utils.ScenarioManager.ScenarioInfo import ScenarioInfo
 from utils.observation import Observation, EgoStatus, ObjectStatus
+from utils.recorder import load_result
 
-import os
 import numpy as np
-import pandas as pd
 from typing import Dict
 
 import matplotlib
@@ -109,7 +108,8 @@ class Player(FuncAnimation):
 
 
 class Visualizer():
-    def __init__(self):
+    def __init__(self, memo_size: int = BORDER_MEMO_SIZE):
+        self.memo_size = memo_size  # 解析路网时车道边界计算结果的缓存数量上限，对应配置项borderMemoSize
         self.result_df = None       # 输出文件对应的DataFrame
         self.scene_info = None      # 待可视化的场景信息
         self.road_info = None       # 通过parse_opendrive模块解析出的opendrive路网信息
@@ -127,15 +127,12 @@ class Visualizer():
     def replay_result(self, result_path: str, save_path: str=None):
         """可视化回放接口"""
         # 解析结果文件
-        self.result_df = pd.read_csv(result_path)
+        self.result_df, result_meta = load_result(result_path)
         # 加载场景信息
-        result_file = os.path.basename(result_path)
-        mode = result_file.split('_')[0]
-        task = '_'.join(result_file.split('_')[2:-1])
-        self.scene_info = self._load_result_scene(mode, task)
+        self.scene_info = self._load_result_scene(result_meta['mode'], result_meta['name'])
         self.scene_info.task_info['dt'] = f"{self.result_df.iloc[1, 0] - self.result_df.iloc[0, 0]:.2f}"
         # 解析opendrive路网文件
-        self.road_info = parse_opendrive(self.scene_info.source_file['xodr'])
+        self.road_info = parse_opendrive(self.scene_info.source_file['xodr'], memo_size=self.memo_size)
         # 进行可视化回放
         self.replay_create_ax()
         ani = Player(self.fig, self.replay_update, playerax=self.ax_player, init_func=self.plot_static, interval=100, repeat=False, maxi=len(self.result_df)-1)
@@ -266,7 +263,7 @@ class Visualizer():
         # 加载场景信息
         self.scene_info = self._load_result_scene(mode, task)
         # 解析opendrive路网文件
-        self.road_info = parse_opendrive(self.scene_info.source_file['xodr'])
+        self.road_info = parse_opendrive(self.scene_info.source_file['xodr'], memo_size=self.memo_size)
         # 绘制路网信息
         self._plot_roads(self.ax, self.road_info, draw_arrow=True)
         ax_map_range = self._update_ax_limit(self.ax, *self._get_road_boundary(self.road_info))
@@ -288,38 +285,19 @@ class Visualizer():
         """展示指定opendrive路网文件的地图"""
         self.fig = plt.figure(figsize=(self.fig_width, self.fig_height))
         self.ax = self.fig.add_subplot(111)
-        self.road_info = parse_opendrive(xodr_path)
+        self.road_info = parse_opendrive(xodr_path, memo_size=self.memo_size)
         self._plot_roads(self.ax, self.road_info, draw_arrow=True)
         plt.show()
 
     def _plot_roads(self, ax, road_info, draw_arrow: bool=False) -> None:
         """根据parse_opendrive模块解析出的opendrive路网信息绘制道路"""
-        xlim1 = float("Inf")
-        xlim2 = -float("Inf")
-        ylim1 = float("Inf")
-        ylim2 = -float("Inf")
         color = "gray"
         label = None
 
         for discrete_lane in road_info.discretelanes:
-            verts = []
-            codes = [Path.MOVETO]
-
-            for x, y in np.vstack(
-                [discrete_lane.left_vertices, discrete_lane.right_vertices[::-1]]
-            ):
-                verts.append([x, y])
-                codes.append(Path.LINETO)
-
-                # if color != 'gray':
-                xlim1 = min(xlim1, x)
-                xlim2 = max(xlim2, x)
-
-                ylim1 = min(ylim1, y)
-                ylim2 = max(ylim2, y)
-
-            verts.append(verts[0])
-            codes[-1] = Path.CLOSEPOLY
+            outline = np.vstack([discrete_lane.left_vertices, discrete_lane.right_vertices[::-1]])
+            verts = np.vstack([outline, outline[:1]])
+            codes = [Path.MOVETO] + [Path.LINETO] * (len(outline) - 1) + [Path.CLOSEPOLY]
 
             path = Path(verts, codes)
 
@@ -476,12 +454,8 @@ class Visualizer():
 
     def _get_road_boundary(self, road_info: dict) -> list:
         """获取地图边界信息"""
-        points = np.empty(shape=[0, 2])
-        for discrete_lane in road_info.discretelanes:
-            points = np.concatenate(
-                [discrete_lane.left_vertices, discrete_lane.right_vertices, discrete_lane.center_vertices, points],
-                axis=0)
-        return [np.min(points[:, 0]), np.max(points[:, 0])], [np.min(points[:, 1]), np.max(points[:, 1])]    
+        x_min, y_min, x_max, y_max = road_info.bbox
+        return [x_min, x_max], [y_min, y_max]
         
     def _get_frame_info_from_result(self, frame: int) -> dict:
         """从输出文件中获取指定帧的信息"""